@@ -0,0 +1,459 @@
+"""
+fakeoracle -- a stand-in for cx_Oracle backed by sqlite
+
+Just enough of cx_Oracle for orapig to introspect packages: the
+data dictionary views all_objects, all_procedures, all_arguments,
+all_source and all_synonyms live in a sqlite file, and
+DBMS_UTILITY.NAME_RESOLVE is emulated.  Every query and fetched row
+is counted so generator cost can be measured without Oracle.
+
+Anonymous PL/SQL blocks are accepted and do nothing, so the
+generated wrappers themselves can be timed; statements a connection
+has not seen before are counted as parses.  A test can give a
+procedure a python body (Database.addbody) to compute OUT values.
+
+    import fakeoracle
+    db=fakeoracle.Database('/tmp/dict.db')
+    db.addpackage('SCOTT','TINY',[('procedure','p',[('x','IN','NUMBER')],None,[])])
+    sys.modules['cx_Oracle']=fakeoracle
+    fakeoracle.use(db)
+"""
+#-----------------------------------------------------------------------
+# Copyright (c) 2008, Pixar.  See the attached file LICENSE.txt for
+# information on copying.
+#-----------------------------------------------------------------------
+
+import os
+import re
+import sqlite3
+import decimal
+import threading
+
+# cx_Oracle type objects; orapig only ever uses them by name
+(STRING, NUMBER, DATETIME, TIMESTAMP, CURSOR, BINARY, BLOB, CLOB, BFILE,
+ FIXED_CHAR, LONG_BINARY, LONG_STRING, NCLOB, OBJECT, ROWID,
+ NATIVE_FLOAT) = \
+    ('STRING', 'NUMBER', 'DATETIME', 'TIMESTAMP', 'CURSOR', 'BINARY',
+     'BLOB', 'CLOB', 'BFILE', 'FIXED_CHAR', 'LONG_BINARY', 'LONG_STRING',
+     'NCLOB', 'OBJECT', 'ROWID', 'NATIVE_FLOAT')
+SYSDBA=2
+
+class DatabaseError(Exception):
+    pass
+
+schema="""
+create table all_objects(owner, object_name, object_type, last_ddl_time);
+create table all_procedures(owner, object_name, procedure_name, object_type,
+    overload, subprogram_id, deterministic, result_cache);
+create table all_arguments(owner, package_name, object_name, overload,
+    subprogram_id, argument_name, position, sequence, data_level,
+    data_type, in_out, data_length, data_precision, data_scale,
+    type_name, type_subname, pls_type, char_length);
+create table all_source(owner, name, type, line, text);
+create table all_synonyms(owner, synonym_name, table_owner, table_name,
+    db_link);
+create index all_objects_ix on all_objects(object_name, owner);
+create index all_procedures_ix on all_procedures(owner, object_name);
+create index all_arguments_ix on all_arguments(owner, package_name,
+    object_name);
+create index all_source_ix on all_source(owner, name, type, line);
+"""
+
+# data_length of a scalar argument, by type
+typelengths={
+    'VARCHAR2'	:32767,
+    'CHAR'	:32767,
+    'NUMBER'	:22,
+    'FLOAT'	:22,
+    'DATE'	:7,
+    'TIMESTAMP'	:11,
+    'RAW'	:32767,
+}
+
+def nvl(a,b):
+    """oracle's nvl, for the sqlite connections"""
+    if a is None:
+        return b
+    return a
+
+def nlssort(s,param):
+    """oracle's nlssort; sqlite's text order is already binary"""
+    return s
+
+#-----------------------------------------------------------------------
+# Database -- the sqlite data dictionary and its counters
+#-----------------------------------------------------------------------
+
+class Database:
+    """a data dictionary in a sqlite file, made if it does not exist"""
+    def __init__(self,path):
+        self.path=path
+        self.lock=threading.Lock()
+        self.queries=0		# execute and callproc calls
+        self.rows=0		# rows fetched
+        self.parses=0		# statements not found in a statement cache
+        self.bodies={}		# PKG.PROC -> python body of the procedure
+        if os.path.exists(path):
+            return
+        db=self.connect()
+        db.executescript(schema)
+        db.commit()
+        db.close()
+
+    def connect(self):
+        """a new sqlite connection to the dictionary"""
+        db=sqlite3.connect(self.path,check_same_thread=False)
+        db.text_factory=str
+        db.create_function('nvl',2,nvl)
+        db.create_function('nlssort',2,nlssort)
+        return db
+
+    def count(self,queries=0,rows=0,parses=0):
+        """add to the counters"""
+        self.lock.acquire()
+        self.queries+=queries
+        self.rows+=rows
+        self.parses+=parses
+        self.lock.release()
+
+    def reset(self):
+        """zero the counters"""
+        self.count(-self.queries,-self.rows,-self.parses)
+
+    def addbody(self,name,body):
+        """run body when procedure name (PKG.PROC) is called; it takes
+        the bind values and returns them as they are after the call"""
+        self.bodies[name.upper()]=body
+
+    def addsynonym(self,owner,synonym,table_owner,table_name):
+        """add a (possibly PUBLIC) synonym for a package"""
+        db=self.connect()
+        db.execute("insert into all_synonyms values (?,?,?,?,NULL)",
+                   (owner,synonym.upper(),table_owner,table_name.upper()))
+        db.commit()
+        db.close()
+
+    def addpackage(self,owner,name,subprograms,doc=(),
+                   ddltime='2008-05-30 00:00:00',type='PACKAGE',
+                   resultcache=()):
+        """add a package spec to the dictionary
+
+        subprograms is a list of (kind, name, params, return type, doc
+        lines), where kind is 'procedure' or 'function' and params is a
+        list of (name, mode, data type).  Mode is IN, OUT or IN/OUT; the
+        data type is as all_arguments spells it, with 'PL/SQL TABLE'
+        meaning a table of number and 'PL/SQL TABLE OF VARCHAR2' one of
+        strings.  With type='TYPE' it is an object type with member
+        subprograms instead, which all_arguments also lists under
+        package_name.  The functions named in resultcache are declared
+        RESULT_CACHE.
+        """
+        name=name.upper()
+        db=self.connect()
+        for t in (type,type+' BODY'):
+            db.execute("insert into all_objects values (?,?,?,?)",
+                       (owner,name,t,ddltime))
+
+        src=['package %s\n'%name.lower()]
+        for line in doc:
+            src.append('--+ %s\n'%line)
+        src.append('as\n')
+        src.append('    type numtbl is table of number index by binary_integer;\n')
+        src.append('    type strtbl is table of varchar2(32767) index by binary_integer;\n')
+
+        args=[]
+        for i in range(len(subprograms)):
+            kind,pname,params,rettype,pdoc=subprograms[i]
+            procname=pname.upper()
+            rc=pname in resultcache and 'YES' or 'NO'
+            db.execute("insert into all_procedures values (?,?,?,?,?,?,?,?)",
+                       (owner,name,procname,type,None,i+1,'NO',rc))
+
+            src.append('    '+'-'*68+'\n')
+            for line in pdoc:
+                src.append('    --+ %s\n'%line)
+            src.append('    '+'-'*68+'\n')
+            decl='    %s %s'%(kind,pname)
+            if params:
+                decl+='('+', '.join(['%s %s %s'%(a,m.lower(),plsql(t))
+                                     for a,m,t in params])+')'
+            if kind=='function':
+                decl+=' return %s'%plsql(rettype)
+                if pname in resultcache:
+                    decl+=' result_cache'
+            src.append(decl+';\n')
+
+            rows=[]
+            if kind=='function':
+                rows.append((None,0,0,rettype,'OUT'))
+            elif not params:
+                rows.append((None,1,0,None,'IN'))
+            for j in range(len(params)):
+                a,m,t=params[j]
+                if t.startswith('PL/SQL TABLE'):
+                    rows.append((a.upper(),j+1,0,'PL/SQL TABLE',m))
+                    rows.append((None,1,1,t[16:] or 'NUMBER',m))
+                else:
+                    rows.append((a.upper(),j+1,0,t,m))
+            for j in range(len(rows)):
+                a,position,level,t,m=rows[j]
+                args.append((owner,name,procname,None,i+1,a,position,j+1,
+                             level,t,m,typelengths.get(t),None,None,
+                             None,None,None,None))
+        src.append('end %s;\n'%name.lower())
+
+        db.executemany("insert into all_arguments values "
+                       "(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",args)
+        db.executemany("insert into all_source values (?,?,?,?,?)",
+                       [(owner,name,type,i+1,src[i])
+                        for i in range(len(src))])
+        db.commit()
+        db.close()
+
+def plsql(t):
+    """the PL/SQL spelling of an all_arguments data type"""
+    return {'PL/SQL TABLE':'numtbl',
+            'PL/SQL TABLE OF VARCHAR2':'strtbl',
+            'REF CURSOR':'sys_refcursor'}.get(t,t.lower())
+
+#-----------------------------------------------------------------------
+# the cx_Oracle interface
+#-----------------------------------------------------------------------
+
+class Var:
+    """a bind variable"""
+    def __init__(self,type,value=None,outconverter=None):
+        self.type=type
+        self.value=value
+        self.outconverter=outconverter
+
+    def getvalue(self,pos=0):
+        if self.value is None:
+            return None
+        elif self.outconverter:
+            return self.outconverter(self.value)
+        elif self.type==NUMBER and not isinstance(self.value,list):
+            # as cx_Oracle reads a NUMBER variable
+            return float(self.value)
+        return self.value
+
+    def setvalue(self,pos,value):
+        if self.type is decimal.Decimal and isinstance(value,float):
+            value=decimal.Decimal(repr(value))
+        elif self.type is decimal.Decimal and value is not None:
+            value=decimal.Decimal(value)
+        self.value=value
+
+class LOB:
+    """a LOB held in memory; each read or write is a round trip"""
+    chunksize=8		# small, so that tests cross many chunks
+
+    def __init__(self,database,type,data=''):
+        self.database=database
+        self.type=type
+        self.data=data
+
+    def getchunksize(self):
+        return self.chunksize
+
+    def size(self):
+        self.database.count(queries=1)
+        return len(self.data)
+
+    def read(self,offset=1,amount=None):
+        self.database.count(queries=1)
+        if amount is None:
+            return self.data[offset-1:]
+        return self.data[offset-1:offset-1+amount]
+
+    def write(self,data,offset=1):
+        self.database.count(queries=1)
+        self.data=self.data[:offset-1]+data+self.data[offset-1+len(data):]
+
+class Cursor:
+    """a cursor over a sqlite connection"""
+    def __init__(self,connection):
+        self.connection=connection
+        self.arraysize=100
+        self.description=None
+        self.scurs=None
+        self.buffer=[]
+        self.bindvars=[]
+        self.rowcount=0
+        self.statement=None
+
+    def var(self,type,size=0,arraysize=1,outconverter=None,*args,**kw):
+        return Var(type,outconverter=outconverter)
+
+    def arrayvar(self,type,value,size=0):
+        if isinstance(value,int):
+            value=[None]*value
+        var=Var(type,list(value))
+        var.size=size
+        return var
+
+    def block(self,sql,params):
+        """run an anonymous PL/SQL block, which does nothing here"""
+        if self.connection.closed:
+            raise DatabaseError('DPI-1010: not connected')
+        self.statement=sql
+        cache=self.connection.stmtcache
+        if sql not in cache:
+            cache[sql]=1
+            self.connection.database.count(parses=1)
+        if isinstance(params,dict):
+            params=params.values()
+        self.bindvars=[isinstance(p,Var) and p or Var(None,p) for p in params]
+
+    def body(self,sql):
+        """the python body of the procedure a block calls, if any"""
+        m=re.match(r'begin (?::1 := )?([\w.$#]+)\(',sql)
+        return m and self.connection.database.bodies.get(m.group(1))
+
+    def setinputsizes(self,*args,**kw):
+        self.inputsizes=args
+
+    def executemany(self,sql,rows):
+        """run an anonymous PL/SQL block once per row"""
+        self.connection.database.count(queries=1)
+        self.block(sql,[])
+        body=self.body(sql)
+        if body:
+            rows=[body(*row) for row in rows]
+        if rows:
+            self.bindvars=[Var(None,[row[i] for row in rows])
+                           for i in range(len(rows[0]))]
+            for var in self.bindvars:
+                var.getvalue=var.value.__getitem__
+        self.rowcount=len(rows)
+
+    def execute(self,sql,params=None,**kw):
+        database=self.connection.database
+        database.count(queries=1)
+        if params is None:
+            params=kw
+        if sql[:6].lower()=='begin ':
+            self.block(sql,params)
+            body=self.body(sql)
+            if body:
+                values=body(*[var.getvalue() for var in self.bindvars])
+                for var,value in zip(self.bindvars,values):
+                    var.setvalue(0,value)
+            return None
+        if isinstance(params,(list,tuple)):
+            params=dict([(str(i+1),params[i]) for i in range(len(params))])
+        self.scurs=self.connection.db.execute(sql,params)
+        self.description=self.scurs.description
+        self.buffer=[]
+        return self
+
+    def fill(self):
+        """refill the row buffer, one arraysize round trip at a time"""
+        if not self.buffer and self.scurs is not None:
+            self.buffer=self.scurs.fetchmany(self.arraysize)
+            self.connection.database.count(rows=len(self.buffer))
+            self.buffer.reverse()
+        return self.buffer
+
+    def fetchone(self):
+        if self.fill():
+            return self.buffer.pop()
+        return None
+
+    def fetchmany(self,n=None):
+        n=n or self.arraysize
+        rv=[]
+        while len(rv)<n and self.fill():
+            rv.append(self.buffer.pop())
+        return rv
+
+    def fetchall(self):
+        rv=[]
+        while self.fill():
+            rv.append(self.buffer.pop())
+        return rv
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        row=self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def callproc(self,name,args=()):
+        self.connection.database.count(queries=1)
+        if name.upper()!='DBMS_UTILITY.NAME_RESOLVE':
+            raise DatabaseError('PLS-00201: %s is not emulated'%name)
+        objname=args[0].upper()
+        user=self.connection.username
+        db=self.connection.db
+        found=db.execute("""select owner, object_name from all_objects
+                            where owner=? and object_name=?
+                              and object_type='PACKAGE'""",
+                         (user,objname)).fetchone()
+        if found is None:
+            found=db.execute("""select table_owner, table_name
+                                from all_synonyms
+                                where synonym_name=?
+                                  and owner in (?,'PUBLIC')
+                                order by owner='PUBLIC'""",
+                             (objname,user)).fetchone()
+        if found is None:
+            raise DatabaseError('ORA-06564: object %s does not exist'%objname)
+        return [args[0],args[1],found[0],found[1],None,None,9,0]
+
+    def close(self):
+        self.scurs=None
+
+class Connection:
+    """a session on the dictionary"""
+    def __init__(self,database,username,dsn=None):
+        self.database=database
+        self.username=username
+        self.dsn=dsn
+        self.db=database.connect()
+        self.stmtcache={}
+        self.closed=False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def createlob(self,type):
+        return LOB(self.database,type)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.db.close()
+        self.closed=True
+
+class SessionPool:
+    """a pool that hands out fresh connections"""
+    def __init__(self,user,password,dsn,min=1,max=2,increment=1,**kw):
+        self.username=user.upper()
+        self.dsn=dsn
+
+    def acquire(self):
+        return Connection(current,self.username,self.dsn)
+
+    def release(self,conn):
+        conn.close()
+
+current=None	# the Database connect() attaches to
+
+def use(database):
+    """make connect() and SessionPool attach to this database"""
+    global current
+    current=database
+
+def connect(connstr,mode=None,**kw):
+    dsn=None
+    if '@' in connstr:
+        connstr,dsn=connstr.split('@',1)
+    return Connection(current,connstr.split('/')[0].upper(),dsn)
@@ -0,0 +1,505 @@
+#!/usr/anim/bin/pypix
+"""
+faketests -- generator and generated code tests over fakeoracle
+
+The tests in samples/unittests.py need an Oracle database with the
+sample packages installed.  These run the generator, and the code it
+writes, against the sqlite stand-in for the data dictionary instead,
+for what can be checked without a server.
+
+    python faketests.py
+"""
+#-----------------------------------------------------------------------
+# Copyright (c) 2008, Pixar.  See the attached file LICENSE.txt for
+# information on copying.
+#-----------------------------------------------------------------------
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from distutils.spawn import find_executable
+from cStringIO import StringIO
+
+benchdir=os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.dirname(benchdir))
+sys.path.insert(0,benchdir)
+
+import fakeoracle
+sys.modules['cx_Oracle']=fakeoracle
+import orapig
+
+user='ORAPIG'
+
+class FakeTestBase(object):
+    """a fresh dictionary in a temporary directory for each test"""
+
+    def setUp(self):
+        self.workdir=tempfile.mkdtemp()
+        self.db=fakeoracle.Database(os.path.join(self.workdir,'dict.db'))
+        fakeoracle.use(self.db)
+        self.conn=fakeoracle.connect(user)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def generate(self,names,modname='gen',**kw):
+        """import the module generated for some packages"""
+        output=StringIO()
+        orapig.PyTrans(self.conn,output,**kw).dofile(names)
+        return self.load(modname,output.getvalue())
+
+    def load(self,modname,source):
+        """import source as a module of its own"""
+        module=type(sys)(modname)
+        sys.modules[modname]=module
+        exec source in module.__dict__
+        return module
+
+
+class CacheTest(FakeTestBase, unittest.TestCase):
+    """--cache"""
+
+    def testsynonymddltime(self):
+        self.db.addpackage('OTHER','BILLING',
+                           [('procedure','charge',[('amt','IN','NUMBER')],
+                             None,[])])
+        self.db.addsynonym(user,'BILLS','OTHER','BILLING')
+        path=os.path.join(self.workdir,'cache')
+        for run in (1,2):
+            cache=orapig.Pcache(path)
+            trans=orapig.Trans(self.conn,None)
+            self.db.reset()
+            pdat=list(trans.getclasses(['BILLS'],cache=cache))[0]
+            cache.save()
+            self.assert_(pdat.ddltime is not None)
+            if run==2:
+                # validated, not introspected again
+                self.assertEquals(1,self.db.queries)
+
+
+class ResultCacheTest(FakeTestBase, unittest.TestCase):
+    """cached function results"""
+
+    def testdatabases(self):
+        self.db.addpackage(user,'RATES',
+                           [('function','rate',[('k','IN','NUMBER')],
+                             'NUMBER',[])],resultcache=['rate'])
+        calls=[]
+        def rate(rv,k):
+            calls.append(k)
+            return len(calls),k
+        self.db.addbody('RATES.RATE',rate)
+        module=self.generate(['RATES'])
+        cache=module.Rates.caches['rate']
+        self.assertEquals(orapig.PyTrans.resultttl,cache.ttl)
+        prod=module.Rates(fakeoracle.connect(user+'/x@prod').cursor())
+        test=module.Rates(fakeoracle.connect(user+'/x@test').cursor())
+        self.assertEquals(1,prod.rate(7))
+        self.assertEquals(2,test.rate(7))	# not prod's result
+        other=module.Rates(fakeoracle.connect(user+'/x@prod').cursor())
+        self.assertEquals(1,other.rate(7))	# prod's result
+        self.assertEquals([7,7],calls)
+        cache.invalidate(7)
+        self.assertEquals(0,len(cache))
+
+
+class JobsTest(FakeTestBase, unittest.TestCase):
+    """--jobs"""
+
+    def testbatches(self):
+        names=['P%d'%i for i in range(8)]
+        for name in names:
+            self.db.addpackage(user,name,
+                               [('procedure','p',[('a','IN','NUMBER')],
+                                 None,[])])
+        trans=orapig.Trans(self.conn,None)
+        self.db.reset()
+        serial=[pdat.name for pdat in trans.introspect(names)]
+        queries=self.db.queries
+        pool=fakeoracle.SessionPool(user,'','')
+        self.db.reset()
+        pdats=list(trans.introspect(names,jobs=2,pool=pool))
+        self.assertEquals(serial,[pdat.name for pdat in pdats])
+        # one batch per worker, not one introspection per package
+        self.assertEquals(2*queries,self.db.queries)
+
+
+class SweepTest(FakeTestBase, unittest.TestCase):
+    """--schema"""
+
+    def sweep(self,owner):
+        """the models of an owner's packages, by name"""
+        trans=orapig.Trans(self.conn,None)
+        return dict([(pdat.name,pdat) for pdat in trans.sweep(owner)])
+
+    def testtypemethods(self):
+        self.db.addpackage(user,'ADDRESS_T',
+                           [('function','label',[],'VARCHAR2',[])],
+                           type='TYPE')
+        self.db.addpackage(user,'BILLING',
+                           [('procedure','charge',[('amt','IN','NUMBER')],
+                             None,[]),
+                            ('function','total',[],'NUMBER',[])])
+        outdir=os.path.join(self.workdir,'schema')
+        orapig.PyTrans(self.conn,None).doschema(user,outdir)
+        self.assertEquals(['billing.py'],os.listdir(outdir))
+        module=self.load('billing',
+                         open(os.path.join(outdir,'billing.py')).read())
+        self.assertEquals('begin BILLING.CHARGE(:1); end;',
+                          module._BILLING__CHARGE)
+        self.assertEquals('begin :1 := BILLING.TOTAL(); end;',
+                          module._BILLING__TOTAL)
+
+    def testforeignsynonym(self):
+        for name in ('FOREIGN','UNSEEN'):
+            self.db.addpackage('OTHER',name,
+                               [('procedure','p',[('a','IN','NUMBER')],
+                                 None,[])])
+        self.db.addsynonym(user,'FSYN','OTHER','FOREIGN')
+        pdats=self.sweep('OTHER')
+        self.assertEquals('FSYN',pdats['FOREIGN'].callname)
+        self.assertEquals('OTHER.UNSEEN',pdats['UNSEEN'].callname)
+
+    def testnamedsynonym(self):
+        # a synonym named on the command line calls what --schema calls
+        self.db.addpackage('OTHER','FOREIGN',
+                           [('procedure','p',[('a','IN','NUMBER')],None,[])])
+        self.db.addsynonym(user,'FSYN','OTHER','FOREIGN')
+        module=self.generate(['FSYN'])
+        self.assertEquals('begin FSYN.P(:1); end;',module._FSYN__P)
+        self.assertEquals('FSYN',self.sweep('OTHER')['FOREIGN'].callname)
+
+
+class FormsTest(FakeTestBase, unittest.TestCase):
+    """one package generated templated, --runtime and --lazy"""
+
+    def testsame(self):
+        self.db.addpackage(user,'SHOP',
+            [('procedure','p',[('k','IN','NUMBER'),('v','OUT','VARCHAR2')],
+              None,[]),
+             ('function','f',[('k','IN','NUMBER')],'NUMBER',[]),
+             ('procedure','put',[('t','IN','PL/SQL TABLE')],None,[]),
+             ('procedure','grow',[('t','IN/OUT','PL/SQL TABLE OF VARCHAR2')],
+              None,[])])
+        self.db.addbody('SHOP.P',lambda k,v: (k,'v%d'%k))
+        self.db.addbody('SHOP.F',lambda rv,k: (k*2,k))
+        self.db.addbody('SHOP.GROW',lambda t: ([x*2 for x in t],))
+
+        templated=self.generate(['SHOP']).Shop
+        output=StringIO()
+        trans=orapig.PyTrans(self.conn,output,runtime=True)
+        trans.dofile(['SHOP'])
+        trans.doruntime(os.path.join(self.workdir,'orapig_runtime.py'))
+        orapig.PyTrans(self.conn,None).dolazy(['SHOP'],
+            os.path.join(self.workdir,'lazyshop'))
+        sys.path.insert(0,self.workdir)
+        try:
+            runtime=self.load('rtshop',output.getvalue()).Shop
+            lazy=__import__('lazyshop').Shop
+            forms=[self.calls(cls) for cls in (templated,runtime,lazy)]
+        finally:
+            sys.path.remove(self.workdir)
+            for name in ('orapig_runtime','lazyshop','lazyshop._shop',
+                         'lazyshop._shop_doc'):
+                sys.modules.pop(name,None)
+        self.assertEquals(forms[0],forms[1])
+        self.assertEquals(forms[0],forms[2])
+
+    def calls(self,cls):
+        """the results of some calls, and the statements they ran"""
+        curs=self.conn.cursor()
+        shop=cls(curs)
+        rv=[]
+        for call in (lambda: shop.p(1,None),
+                     lambda: shop.p_V([[2,None],[3,None]]),
+                     lambda: shop.f(4),
+                     lambda: shop.put([5,6]),
+                     lambda: shop.grow(['a','b'])):
+            rv.append((call(),curs.statement))
+        return rv
+
+
+class BindTest(FakeTestBase, unittest.TestCase):
+    """variables bound from the dictionary types"""
+
+    def testnumbers(self):
+        self.db.addpackage(user,'NUMS',
+                           [('procedure','p',[('i','IN','NUMBER'),
+                                              ('f','IN','FLOAT')],None,[])])
+        module=self.generate(['NUMS'])
+        big=2**53+1
+        result=module.Nums(self.conn.cursor()).p(big,1.5)
+        self.assertEquals([big,1.5],result)
+        self.assert_(not isinstance(result[0],float))
+
+    def testoutstrings(self):
+        self.db.addpackage(user,'NAMES',
+                           [('procedure','p',[('k','IN','NUMBER'),
+                                              ('v','OUT','VARCHAR2')],
+                             None,[])])
+        module=self.generate(['NAMES'])
+        curs=self.conn.cursor()
+        names=module.Names(curs)
+        self.assertEquals([[1,None],[2,None]],names.p_V([[1,None],[2,None]]))
+        self.assertEquals(4000,curs.inputsizes[1])
+        names.maxoutstring=100
+        names.p_V([[1,None]])
+        self.assertEquals(100,curs.inputsizes[1])
+
+    def testoutraw(self):
+        # no array bind size for RAW, so _V calls a row at a time
+        self.db.addpackage(user,'BYTES',
+                           [('procedure','p',[('k','IN','NUMBER'),
+                                              ('r','OUT','RAW')],
+                             None,[])])
+        self.db.addbody('BYTES.P',lambda k,r: (k,'\x00'*int(k)))
+        bytes=self.generate(['BYTES']).Bytes(self.conn.cursor())
+        self.assertEquals([[1,'\x00'],[2,'\x00\x00']],
+                          bytes.p_V([[1,None],[2,None]]))
+        self.assert_('one round trip per row' in bytes.p_V.__doc__)
+
+
+class ArrayTest(FakeTestBase, unittest.TestCase):
+    """PL/SQL table parameters"""
+
+    def setUp(self):
+        FakeTestBase.setUp(self)
+        self.db.addpackage(user,'TBL',
+            [('procedure','grow',[('t','IN/OUT','PL/SQL TABLE OF VARCHAR2')],
+              None,[]),
+             ('procedure','put',[('t','IN','PL/SQL TABLE OF VARCHAR2')],
+              None,[])])
+        self.curs=self.conn.cursor()
+        self.tbl=self.generate(['TBL']).Tbl(self.curs)
+
+    def testinoutstrings(self):
+        # the procedure may lengthen the elements it is given
+        self.tbl.grow(['a','b'])
+        self.assertEquals(32767,self.curs.bindvars[0].size)
+
+    def testinstrings(self):
+        self.tbl.put(['a','b'])
+        self.assertEquals(16,self.curs.bindvars[0].size)
+        self.tbl.put(['x'*20])
+        self.assertEquals(32,self.curs.bindvars[0].size)
+
+
+class LobTest(FakeTestBase, unittest.TestCase):
+    """LOB results and file-like LOB parameters"""
+
+    def setUp(self):
+        FakeTestBase.setUp(self)
+        self.db.addpackage(user,'DOCS',
+                           [('function','echo',[('x','IN','CLOB')],
+                             'CLOB',[])])
+        def echo(rv,x):
+            if isinstance(x,fakeoracle.LOB):
+                x=x.data
+            return fakeoracle.LOB(self.db,'CLOB',x),x
+        self.db.addbody('DOCS.ECHO',echo)
+        self.docs=self.generate(['DOCS']).Docs(self.conn.cursor())
+        self.docs.lobinline=100
+
+    def testthreshold(self):
+        self.assertEquals('x'*100,self.docs.echo('x'*100))
+        self.db.reset()
+        reader=self.docs.echo('x'*101)
+        self.assert_(not isinstance(reader,str))
+        self.assertEquals(2,self.db.queries)	# the call and one read
+        self.assertEquals('x'*101,reader.read())
+
+    def testreader(self):
+        text=''.join([chr(ord('a')+i%26) for i in range(1000)])
+        reader=self.docs.echo(text)
+        self.assertEquals(text[:10],reader.read(10))
+        self.assertEquals(text[10:300],reader.read(290))	# past the read ahead
+        self.assertEquals(text[300:],''.join(list(reader)))
+        self.assertEquals('',reader.read())
+        self.assertEquals(1000,reader.size())
+        pieces=list(self.docs.echo(text))
+        self.assertEquals(text,''.join(pieces))
+        self.assert_(len(pieces)>2)
+        self.assert_(max(map(len,pieces))<=reader.readsize)
+
+    def testfilelike(self):
+        text='y'*50+'z'*30
+        self.db.reset()
+        self.assertEquals(text,self.docs.echo(StringIO(text)))
+        # one write per LobReader.chunks chunks, the call and one read
+        writes=-(-len(text)//(fakeoracle.LOB.chunksize*16))
+        self.assertEquals(writes+2,self.db.queries)
+
+    def testlocator(self):
+        self.docs.lobinline=None
+        lob=self.docs.echo('x'*500)
+        self.assert_(isinstance(lob,fakeoracle.LOB))
+        self.assertEquals('x'*500,lob.data)
+
+
+class MetricsTest(FakeTestBase, unittest.TestCase):
+    """Metrics"""
+
+    def testnested(self):
+        self.db.addpackage(user,'TBL',
+            [('procedure','grow',[('t','IN/OUT','PL/SQL TABLE OF VARCHAR2')],
+              None,[]),
+             ('procedure','put',[('t','IN','PL/SQL TABLE')],None,[])])
+        module=self.generate(['TBL'])
+        metrics=module.Metrics()
+        metrics.watch(module.Tbl)
+        try:
+            tbl=module.Tbl(self.conn.cursor())
+            tbl.maxarray=2
+            tbl.put([1,2,3,4,5])	# in three chunks
+            tbl.grow_V([[['a']],[['b']]])	# a call per row
+        finally:
+            metrics.unwatch(module.Tbl)
+        stats=metrics.snapshot()
+        self.assertEquals(1,stats['Tbl.put']['calls'])
+        self.assertEquals(5,stats['Tbl.put']['elements'])
+        self.assertEquals(1,stats['Tbl.grow_V']['calls'])
+        self.assertEquals(2,stats['Tbl.grow_V']['rows'])
+        self.assert_(not stats.has_key('Tbl.grow'))
+
+
+class PooledTest(FakeTestBase, unittest.TestCase):
+    """Pooled, a session per call"""
+
+    def setUp(self):
+        FakeTestBase.setUp(self)
+        self.db.addpackage(user,'NUMS',
+                           [('procedure','p',[('i','IN','NUMBER')],None,[])])
+        self.module=self.generate(['NUMS'])
+        self.pool=fakeoracle.SessionPool(user,'','')
+
+    def testreuse(self):
+        pooled=self.module.Pooled(self.module.Nums,self.pool)
+        self.assertEquals([1],pooled.p(1))
+        w=pooled._idle[0][0]
+        v=w._vars['p']
+        self.assertEquals([2],pooled.p(2))
+        self.assertEquals([w],[idle for idle,t in pooled._idle])
+        self.assert_(w._vars['p'] is v)
+        pooled.close()
+        self.assertEquals([],pooled._idle)
+        self.assert_(w.curs.connection.closed)
+
+    def testmaxidle(self):
+        pooled=self.module.Pooled(self.module.Nums,self.pool,maxidle=1)
+        b=pooled.batch()
+        b.p(1)
+        held=b.pkg
+        pooled.p(2)		# on a second session, kept idle
+        b.send()		# the first session is one too many
+        self.assertEquals(1,len(pooled._idle))
+        self.assert_(held.curs.connection.closed)
+        self.assertEquals([pooled._idle[0][0].curs.connection],
+                          pooled._sessions)
+
+    def testidletime(self):
+        pooled=self.module.Pooled(self.module.Nums,self.pool)
+        pooled.p(1)
+        w=pooled._idle[0][0]
+        pooled.idletime=-1
+        pooled.p(2)
+        self.assert_(w.curs.connection.closed)
+        self.assert_(pooled._idle[0][0] is not w)
+
+    def testdead(self):
+        pooled=self.module.Pooled(self.module.Nums,self.pool)
+        b=pooled.batch()
+        b.p(1)
+        pooled.p(2)
+        b.send()
+        self.assertEquals(2,len(pooled._idle))
+        for w,t in pooled._idle:
+            w.curs.connection.close()	# the database went away
+        self.assertRaises(fakeoracle.DatabaseError,pooled.p,3)
+        self.assertEquals([],pooled._idle)
+        self.assertEquals([],pooled._sessions)
+        self.assertEquals([4],pooled.p(4))
+
+    def testbatch(self):
+        pooled=self.module.Pooled(self.module.Nums,self.pool)
+        with pooled.batch() as b:
+            r=b.p(1)
+            self.assertEquals([],pooled._idle)
+        self.assertEquals([1],r.result())
+        self.assertEquals(1,len(pooled._idle))
+        b=pooled.batch()
+        b.p(2)
+        self.assertEquals([],pooled._idle)
+        b.send()
+        self.assertEquals(1,len(pooled._idle))
+
+
+class TagTest(FakeTestBase, unittest.TestCase):
+    """session tags"""
+
+    def testtags(self):
+        for name in ('KEYWORD','LOOKUP'):
+            self.db.addpackage(user,name,
+                               [('procedure','p',[('i','IN','NUMBER')],
+                                 None,[])])
+        curs=self.conn.cursor()
+        # two modules, as --schema writes them, over one session
+        keyword=self.generate(['KEYWORD'],'keyword').Keyword(curs)
+        lookup=self.generate(['LOOKUP'],'lookup').Lookup(curs)
+        keyword.tagging=lookup.tagging=True
+        keyword.p(1)
+        self.assertEquals(('KEYWORD','KEYWORD.P'),
+                          (self.conn.module,self.conn.action))
+        lookup.p(1)
+        self.assertEquals(('LOOKUP','LOOKUP.P'),
+                          (self.conn.module,self.conn.action))
+        keyword.p(1)
+        self.assertEquals(('KEYWORD','KEYWORD.P'),
+                          (self.conn.module,self.conn.action))
+        keyword.clientid='bob'
+        keyword.p(1)
+        self.assertEquals('bob',self.conn.client_identifier)
+
+
+class AsyncTest(FakeTestBase, unittest.TestCase):
+    """--async, whose classes need python3"""
+
+    def run3(self,names,script):
+        """run script under python3, with the module generated for some
+        packages imported as gen; returns what it prints"""
+        python3=find_executable('python3')
+        if python3 is None:
+            self.skipTest('no python3')
+        output=StringIO()
+        orapig.PyTrans(self.conn,output,asyncclasses=True).dofile(names)
+        open(os.path.join(self.workdir,'gen.py'),'w').write(output.getvalue())
+        head=('import sys, asyncio\n'
+              'sys.path[:0]=[%r,%r]\n'
+              'import fakeoracle\n'
+              'sys.modules["cx_Oracle"]=fakeoracle\n'
+              'fakeoracle.use(fakeoracle.Database(%r))\n'
+              'import gen\n'
+              'pool=fakeoracle.SessionPool(%r,"","")\n')%\
+              (benchdir,self.workdir,self.db.path,user)
+        proc=subprocess.Popen([python3,'-c',head+script],
+                              stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+        out,err=proc.communicate()
+        self.assertEquals(0,proc.returncode,err)
+        return out.strip()
+
+    def testtableouts(self):
+        self.db.addpackage(user,'TBL',
+                           [('procedure','fill',[('n','IN','NUMBER'),
+                                                 ('t','OUT','PL/SQL TABLE')],
+                             None,[])])
+        out=self.run3(['TBL'],
+                      'a=gen.TblAsync(pool)\n'
+                      'rv=asyncio.run(a.fill_V([[1,3],[2,3]]))\n'
+                      'print(len(rv),rv[1][0])\n')
+        self.assertEquals('2 2',out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+#!/usr/anim/bin/pypix
+"""
+orapigbench -- measure the generator against a fake data dictionary
+
+Builds synthetic packages in a sqlite-backed stand-in for the Oracle
+data dictionary (see fakeoracle.py), runs PyTrans.dofile on them and
+reports wall time, dictionary queries and rows fetched, plus the size
+and import time of the generated module, the size and import time of
+its --runtime form, and the time to import its --lazy form and load
+one method.  No Oracle is needed.
+
+    python orapigbench.py --sizes=10,100,1000,5000
+
+With --calls=N it instead times N calls through a generated class
+against the same statements executed directly on a cursor, which is
+the per-call overhead of the wrapper itself, for the templated and
+the --runtime module.
+"""
+#-----------------------------------------------------------------------
+# Copyright (c) 2008, Pixar.  See the attached file LICENSE.txt for
+# information on copying.
+#-----------------------------------------------------------------------
+
+import sys
+import os
+import time
+import json
+import shutil
+import tempfile
+import optparse
+import subprocess
+import py_compile
+from cStringIO import StringIO
+
+benchdir=os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.dirname(benchdir))
+sys.path.insert(0,benchdir)
+
+import fakeoracle
+sys.modules['cx_Oracle']=fakeoracle
+import orapig
+
+user='ORAPIG'
+
+# the shapes of synthetic subprograms, cycled through
+shapes=[
+    ('procedure',[('a','IN','NUMBER'),('b','IN','VARCHAR2')],None),
+    ('function',[('a','IN','NUMBER')],'NUMBER'),
+    ('procedure',[('a','IN','NUMBER'),('t','IN','PL/SQL TABLE')],None),
+    ('procedure',[('a','OUT','NUMBER'),('b','IN/OUT','VARCHAR2')],None),
+    ('function',[],'REF CURSOR'),
+    ('procedure',[('r','OUT','REF CURSOR'),('a','IN','NUMBER')],None),
+    ('function',[('d','IN','DATE')],'DATE'),
+    ('procedure',[],None),
+]
+
+def synthesize(nprocs,docl):
+    """the subprograms of a synthetic package"""
+    rv=[]
+    for i in range(nprocs):
+        kind,params,rettype=shapes[i%len(shapes)]
+        name='%s_%05d'%(kind[0],i)
+        doc=['%s -- synthetic %s number %d'%(name,kind,i)]
+        for j in range(docl-1):
+            doc.append('  line %d of the documentation for %s'%(j+1,name))
+        rv.append((kind,name,params,rettype,doc))
+    return rv
+
+def importtime(path,then='pass'):
+    """seconds to import a generated module (and run then), in a fresh
+    interpreter"""
+    code=("import sys,time;sys.path[:0]=[%r,%r];import fakeoracle;"
+          "sys.modules['cx_Oracle']=fakeoracle;t=time.time();"
+          "import %s;%s;print time.time()-t")%\
+          (os.path.dirname(path),benchdir,
+           os.path.splitext(os.path.basename(path))[0],then)
+    p=subprocess.Popen([sys.executable,'-B','-c',code],stdout=subprocess.PIPE)
+    return float(p.communicate()[0])
+
+def bench(workdir,nprocs,npkgs,docl,jobs):
+    """generate npkgs packages of nprocs procedures, return the numbers"""
+    db=fakeoracle.Database(os.path.join(workdir,'dict%d.db'%nprocs))
+    names=[]
+    for i in range(npkgs):
+        names.append('BENCH%d_%d'%(nprocs,i))
+        db.addpackage(user,names[-1],synthesize(nprocs,docl),
+                      doc=['synthetic package %s'%names[-1]]*docl)
+    fakeoracle.use(db)
+
+    pool=None
+    if jobs>1:
+        pool=fakeoracle.SessionPool(user,'',None,jobs+1,jobs+1,1)
+        conn=pool.acquire()
+    else:
+        conn=fakeoracle.connect(user)
+    output=StringIO()
+    trans=orapig.PyTrans(conn,output)
+    db.reset()
+    t0=time.time()
+    c0=time.clock()
+    trans.dofile(names,jobs,pool)
+    wall=time.time()-t0
+    cpu=time.clock()-c0
+
+    module=os.path.join(workdir,'bench%d.py'%nprocs)
+    f=open(module,'w')
+    f.write(output.getvalue())
+    f.close()
+    cold=importtime(module)	# compiles the source
+    py_compile.compile(module)
+    warm=importtime(module)	# loads the .pyc
+    rv={'procs':nprocs,'packages':npkgs,'wall':wall,'cpu':cpu,
+        'queries':db.queries,'rows':db.rows,
+        'bytes':len(output.getvalue()),
+        'import_cold':cold,'import_warm':warm}
+
+    # the --runtime module, and the runtime it imports
+    rtdir=os.path.join(workdir,'rt%d'%nprocs)
+    os.mkdir(rtdir)
+    rtmodule=os.path.join(rtdir,'bench%d.py'%nprocs)
+    output=StringIO()
+    trans=orapig.PyTrans(conn,output,runtime=True)
+    trans.dofile(names)
+    f=open(rtmodule,'w')
+    f.write(output.getvalue())
+    f.close()
+    trans.doruntime(os.path.join(rtdir,'orapig_runtime.py'))
+    rv['runtime_bytes']=len(output.getvalue())
+    rv['import_runtime']=importtime(rtmodule)
+
+    # the --lazy package, compiled by the generator
+    lazy=os.path.join(workdir,'lazy%d'%nprocs)
+    orapig.PyTrans(conn,None).dolazy(names,lazy)
+    rv['import_lazy']=importtime(lazy,'lazy%d._loadmethod(lazy%d.%s,%r)'%
+        (nprocs,nprocs,names[0].capitalize(),synthesize(1,1)[0][1]))
+    return rv
+
+def calltime(h,ncalls):
+    """seconds for ncalls calls of each of the two HOT methods"""
+    t0=time.time()
+    for i in xrange(ncalls):
+        h.p_00000(i,'x')
+        h.f_00001(i)
+    return time.time()-t0
+
+def callbench(workdir,ncalls):
+    """time calls through a generated class, templated and --runtime,
+    against the same calls made directly on a cursor, return the
+    numbers"""
+    db=fakeoracle.Database(os.path.join(workdir,'calls.db'))
+    db.addpackage(user,'HOT',synthesize(2,1))
+    fakeoracle.use(db)
+    conn=fakeoracle.connect(user)
+    for name,runtime in (('hot',False),('hotrt',True)):
+        output=StringIO()
+        trans=orapig.PyTrans(conn,output,runtime=runtime)
+        trans.dofile(['HOT'])
+        f=open(os.path.join(workdir,name+'.py'),'w')
+        f.write(output.getvalue())
+        f.close()
+    trans.doruntime(os.path.join(workdir,'orapig_runtime.py'))
+    sys.path.insert(0,workdir)
+    import hot
+    import hotrt
+
+    curs=conn.cursor()
+    db.reset()
+    wrapper=calltime(hot.Hot(curs),ncalls)
+    parses=db.parses
+    runtime=calltime(hotrt.Hot(curs),ncalls)
+    metrics=hot.Metrics()
+    metrics.watch(hot.Hot)
+    watched=calltime(hot.Hot(curs),ncalls)
+    metrics.unwatch(hot.Hot)
+
+    t0=time.time()
+    for i in xrange(ncalls):
+        curs.execute(hot._HOT__P_00000,[i,'x'])
+        rv=curs.var(fakeoracle.NUMBER)
+        curs.execute(hot._HOT__F_00001,[rv,i])
+        rv.getvalue()
+    raw=time.time()-t0
+    n=2*ncalls
+    return {'calls':n,'wrapper_us':wrapper*1e6/n,'raw_us':raw*1e6/n,
+            'overhead_us':(wrapper-raw)*1e6/n,'parses':parses,
+            'runtime_us':runtime*1e6/n,'metrics_us':watched*1e6/n}
+
+def main():
+    """main program"""
+    p=optparse.OptionParser(usage="usage: %prog [options]")
+    p.add_option("","--sizes",action="store",type="string",dest="sizes",
+                 default="10,100,1000,5000",
+                 help="procedures per package, comma separated")
+    p.add_option("","--packages",action="store",type="int",dest="packages",
+                 default=1,help="packages per run")
+    p.add_option("","--docl",action="store",type="int",dest="docl",
+                 default=10,help="doc comment lines per procedure")
+    p.add_option("-j","--jobs",action="store",type="int",dest="jobs",
+                 default=1,help="generator --jobs")
+    p.add_option("","--calls",action="store",type="int",dest="calls",
+                 default=0,
+                 help="time N calls through a generated class instead")
+    p.add_option("","--json",action="store_true",dest="json",default=False,
+                 help="report as json")
+    (opts,args)=p.parse_args()
+
+    workdir=tempfile.mkdtemp(prefix='orapigbench')
+    if opts.calls:
+        try:
+            r=callbench(workdir,opts.calls)
+        finally:
+            shutil.rmtree(workdir)
+        if opts.json:
+            print json.dumps(r,indent=1,sort_keys=True)
+        else:
+            print '%8s %12s %12s %12s %7s %12s %12s'%\
+                ('calls','wrapper(us)','raw(us)','overhead(us)','parses',
+                 'runtime(us)','metrics(us)')
+            print '%8d %12.2f %12.2f %12.2f %7d %12.2f %12.2f'%\
+                (r['calls'],r['wrapper_us'],r['raw_us'],r['overhead_us'],
+                 r['parses'],r['runtime_us'],r['metrics_us'])
+        return
+    try:
+        results=[]
+        for n in [int(s) for s in opts.sizes.split(',')]:
+            results.append(bench(workdir,n,opts.packages,opts.docl,opts.jobs))
+    finally:
+        shutil.rmtree(workdir)
+
+    if opts.json:
+        print json.dumps(results,indent=1,sort_keys=True)
+        return
+    print '%6s %4s %9s %9s %8s %9s %10s %9s %9s %9s %10s %9s'%\
+        ('procs','pkgs','wall(s)','cpu(s)','queries','rows','bytes',
+         'cold(s)','warm(s)','lazy(s)','rt bytes','rt(s)')
+    for r in results:
+        print '%6d %4d %9.3f %9.3f %8d %9d %10d %9.3f %9.3f %9.3f %10d %9.3f'%\
+            (r['procs'],r['packages'],r['wall'],r['cpu'],r['queries'],
+             r['rows'],r['bytes'],r['import_cold'],r['import_warm'],
+             r['import_lazy'],r['runtime_bytes'],r['import_runtime'])
+
+if __name__=='__main__':
+    main()
@@ -13,6 +13,16 @@ import cx_Oracle
 import optparse
 import re
 import getpass
+import threading
+import Queue
+import os
+import cPickle
+import json
+import time
+import copy
+import itertools
+import hashlib
+import py_compile
 
 # these are the template fragments necessary
 tmplEnums=(
@@ -22,8 +32,396 @@ tmplEnums=(
     func0,	# function
     func1,	# function returning unsupported datatype
     proc0,	# procedure
-    procv0	# procedure, vectorizing form
-    ) = range(1,8)
+    procv0,	# procedure, vectorizing form
+    stmt0,	# prepared call statement
+    curs0,	# REF CURSOR subprogram, iterator, list and column forms
+    afile0,	# asyncio support, after file0
+    aclass0,	# asyncio class
+    acall0,	# asyncio method
+    amany0,	# asyncio vectorizing procedure
+    astream0,	# asyncio REF CURSOR iterator
+    lfile0,	# --lazy support, after file0
+    lazy0,	# --lazy class, after class0
+    lmod0,	# --lazy methods module
+    lclass0,	# --lazy methods class
+    rt0,	# the call engine of orapig_runtime.py
+    rfile0,	# beginning of a --runtime file
+    rclass0	# --runtime class, before its table
+    ) = range(1,22)
+
+#-----------------------------------------------------------------------
+#  Pdat -- container for everything we know about a package
+#-----------------------------------------------------------------------
+
+# columns of an all_arguments row, as kept in Pdat.args
+argCols=(
+    aName,	# argument_name
+    aType,	# data_type
+    aPosition,	# position
+    aSequence,	# sequence
+    aLevel,	# data_level
+    aInOut,	# in_out
+    aLength,	# data_length
+    aPrecision,	# data_precision
+    aScale	# data_scale
+    ) = range(0,9)
+
+class Pdat:
+    """package data: the dictionary rows for one package, indexed"""
+    def __init__(self,owner,name):
+        self.owner=owner
+        self.name=name
+        self.procs=[]	# procedure and function names, sorted
+        self.args={}	# procedure name -> argument rows, by sequence
+        self.synonym=None	# name the package was requested by, if not its own
+        self.doc=''		# class doc string
+        self.memberdocs={}	# procedure name -> doc string
+        self.ddltime=None	# all_objects.last_ddl_time when introspected
+        self.callname=None	# what the generated code calls it, if not name
+        self.cached=[]		# functions whose results may be cached
+        self.resultcached=[]	# those declared RESULT_CACHE
+
+    def addproc(self,procname,deterministic=None,result_cache=None):
+        """add a procedure from an all_procedures row"""
+        if not self.procs or self.procs[-1]!=procname:
+            self.procs.append(procname)	# skip overloads
+            if 'YES' in (deterministic,result_cache):
+                self.cached.append(procname)
+            if result_cache=='YES':
+                self.resultcached.append(procname)
+
+    def addarg(self,objname,row):
+        """add an argument row (see argCols) of a procedure"""
+        self.args.setdefault(objname,[]).append(tuple(row))
+
+    def todict(self):
+        """the model as plain data, for caches and snapshots"""
+        return self.__dict__.copy()
+
+def pdatfromdict(d):
+    """rebuild a Pdat from Pdat.todict() data"""
+    pdat=Pdat(d['owner'],d['name'])
+    pdat.__dict__.update(d)
+    return pdat
+
+def asstr(x):
+    """turn the unicode json hands back into str, recursively"""
+    if isinstance(x,unicode):
+        return x.encode('utf-8')
+    if isinstance(x,list):
+        return [asstr(i) for i in x]
+    if isinstance(x,dict):
+        return dict([(asstr(k),asstr(v)) for k,v in x.items()])
+    return x
+
+#-----------------------------------------------------------------------
+#  snapshots -- package models in a portable file
+#-----------------------------------------------------------------------
+
+snapshotversion=1
+
+def savesnapshot(path,pdats):
+    """write (requested name, Pdat) pairs to a json snapshot file"""
+    packages=[]
+    for name,pdat in pdats:
+        d=pdat.todict()
+        if d['ddltime'] is not None:
+            d['ddltime']=str(d['ddltime'])
+        packages.append([name,d])
+    f=Outfile(path)
+    json.dump({'version':snapshotversion,'packages':packages},f,
+              sort_keys=True)
+    f.close()
+
+def loadsnapshot(path):
+    """read the (requested name, Pdat) pairs from a json snapshot file"""
+    f=open(path)
+    try:
+        data=asstr(json.load(f))
+    finally:
+        f.close()
+    if data.get('version')!=snapshotversion:
+        raise ValueError('%s: unsupported snapshot version %s'%
+                         (path,data.get('version')))
+    rv=[]
+    for name,d in data['packages']:
+        pdat=pdatfromdict(d)
+        for procname,rows in pdat.args.items():
+            pdat.args[procname]=[tuple(row) for row in rows]
+        rv.append((name,pdat))
+    return rv
+
+#-----------------------------------------------------------------------
+#  Pcache -- persistent cache of package models
+#-----------------------------------------------------------------------
+
+class Pcache:
+    """package models from earlier runs, keyed by user and package name
+
+    An entry is only reused while the package's last_ddl_time is
+    unchanged.  Bump version whenever Pdat changes shape.
+    """
+    version=3
+    def __init__(self,path):
+        self.path=path
+        self.pdats={}
+        try:
+            f=open(path,'rb')
+            try:
+                data=cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError,EOFError,cPickle.UnpicklingError):
+            return
+        if data.get('version')==self.version:
+            for key,d in data['pdats'].items():
+                self.pdats[key]=pdatfromdict(d)
+
+    def get(self,username,package_name):
+        """get a cached model, or None"""
+        return self.pdats.get((username,package_name))
+
+    def put(self,username,package_name,pdat):
+        """remember a model"""
+        self.pdats[(username,package_name)]=pdat
+
+    def save(self):
+        """write the cache back, replacing the old file atomically"""
+        pdats={}
+        for key,pdat in self.pdats.items():
+            pdats[key]=pdat.todict()
+        tmp='%s.%d'%(self.path,os.getpid())
+        f=open(tmp,'wb')
+        try:
+            cPickle.dump({'version':self.version,'pdats':pdats},f,2)
+        finally:
+            f.close()
+        os.rename(tmp,self.path)
+
+#-----------------------------------------------------------------------
+#  Outfile -- a generated file, only replaced when its content changes
+#-----------------------------------------------------------------------
+
+class Outfile:
+    """collects generated text in memory; close() replaces the file
+    atomically, and only if the content is different, so unchanged
+    modules keep their mtime (and their .pyc files)"""
+    def __init__(self,path):
+        self.path=path
+        self.chunks=[]
+
+    def write(self,s):
+        self.chunks.append(s)
+
+    def close(self):
+        """write the file if it changed; returns True if it was written"""
+        data=''.join(self.chunks)
+        self.chunks=[data]
+        try:
+            f=open(self.path,'rb')
+            try:
+                old=f.read()
+            finally:
+                f.close()
+            if len(old)==len(data) and \
+               hashlib.sha1(old).digest()==hashlib.sha1(data).digest():
+                return False
+        except IOError:
+            pass
+        tmp='%s.%d.tmp'%(self.path,os.getpid())
+        f=open(tmp,'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmp,self.path)
+        return True
+
+class Docsplit:
+    """an output for generated methods that writes them without their
+    doc strings, which it collects in docs (method name -> doc)"""
+    docre=re.compile(r'(    def (\w+)\(.*?\):\n)        """\n(.*?)\n        """\n\n?',
+                     re.DOTALL)
+    def __init__(self,output,docs):
+        self.output=output
+        self.docs=docs
+
+    def write(self,s):
+        self.output.write(self.docre.sub(self.split,s))
+
+    def split(self,m):
+        self.docs[m.group(2)]='\n%s\n        '%m.group(3)
+        return m.group(1)
+
+def summarize(written):
+    """report which of the (path, changed) outputs were rewritten"""
+    changed=[path for path,c in written if c]
+    sys.stderr.write('orapig: %d changed, %d unchanged\n'%
+                     (len(changed),len(written)-len(changed)))
+    for path in changed:
+        sys.stderr.write('    %s\n'%path)
+
+#-----------------------------------------------------------------------
+#  Rowgroups -- a streamed query, one package at a time
+#-----------------------------------------------------------------------
+
+class Rowgroups:
+    """the rows of a cursor ordered by package name (first column),
+    taken a package at a time as a sweep walks the package names"""
+    def __init__(self,curs):
+        self.groups=itertools.groupby(curs,lambda row:row[0])
+        self.advance()
+
+    def advance(self):
+        """move to the next package's rows"""
+        try:
+            self.name,self.rows=self.groups.next()
+        except StopIteration:
+            self.name,self.rows=None,iter(())
+
+    def take(self,name):
+        """the rows of package name, or none if it has no rows here;
+        groups sorting before name, which no package asked for, are
+        passed over"""
+        while self.name is not None and self.name<name:
+            self.advance()
+        if self.name!=name:
+            return []
+        rows=list(self.rows)
+        self.advance()
+        return rows
+
+#-----------------------------------------------------------------------
+#  Stats -- round trips and timings of a run (--stats)
+#-----------------------------------------------------------------------
+
+class Stats:
+    """dictionary round trips and generator timings, by method and package"""
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.start=time.time()
+        self.methods={}		# method -> [queries, rows, db seconds]
+        self.packages={}	# package -> seconds
+        self.procs={}		# package.procedure -> seconds
+
+    def query(self,method,queries,rows,seconds):
+        """record round trips made on behalf of a Trans method"""
+        self.lock.acquire()
+        m=self.methods.setdefault(method,[0,0,0.0])
+        m[0]+=queries
+        m[1]+=rows
+        m[2]+=seconds
+        self.lock.release()
+
+    def package(self,name,seconds):
+        """record time spent introspecting or emitting a package"""
+        self.lock.acquire()
+        self.packages[name]=self.packages.get(name,0.0)+seconds
+        self.lock.release()
+
+    def proc(self,name,seconds):
+        """record time spent emitting a procedure"""
+        self.procs[name]=self.procs.get(name,0.0)+seconds
+
+    def todict(self,top=10):
+        """the statistics as plain data"""
+        def slowest(d):
+            items=[(v,k) for k,v in d.items()]
+            items.sort()
+            items.reverse()
+            return [[k,v] for v,k in items[:top]]
+        wall=time.time()-self.start
+        dbtime=0.0
+        methods={}
+        for name,(queries,rows,seconds) in self.methods.items():
+            methods[name]={'queries':queries,'rows':rows,'db':seconds}
+            dbtime+=seconds
+        return {'wall':wall,'db':dbtime,'python':wall-dbtime,
+                'queries':sum([m[0] for m in self.methods.values()]),
+                'rows':sum([m[1] for m in self.methods.values()]),
+                'methods':methods,
+                'packages':slowest(self.packages),
+                'procs':slowest(self.procs)}
+
+    def report(self,f,fmt='text'):
+        """write the statistics to f, as text or json"""
+        d=self.todict()
+        if fmt=='json':
+            json.dump(d,f,indent=1,sort_keys=True)
+            f.write('\n')
+            return
+        f.write('orapig: %d queries, %d rows, %.3fs wall '
+                '(%.3fs db, %.3fs python)\n'%
+                (d['queries'],d['rows'],d['wall'],d['db'],d['python']))
+        f.write('    %-20s %8s %8s %9s\n'%('method','queries','rows','db(s)'))
+        names=d['methods'].keys()
+        names.sort()
+        for name in names:
+            m=d['methods'][name]
+            f.write('    %-20s %8d %8d %9.3f\n'%
+                    (name,m['queries'],m['rows'],m['db']))
+        f.write('slowest packages:\n')
+        for name,seconds in d['packages']:
+            f.write('    %-40s %9.3f\n'%(name,seconds))
+        f.write('slowest procedures:\n')
+        for name,seconds in d['procs']:
+            f.write('    %-40s %9.3f\n'%(name,seconds))
+
+class StatCursor:
+    """a cursor wrapper charging its round trips to the calling method"""
+    def __init__(self,curs,stats):
+        self.__dict__['curs']=curs
+        self.__dict__['stats']=stats
+        self.__dict__['method']='?'
+
+    def __getattr__(self,name):
+        return getattr(self.curs,name)
+
+    def __setattr__(self,name,value):
+        setattr(self.curs,name,value)
+
+    def timed(self,method,queries,f,*args,**kw):
+        """call f, charging the time and rows to method"""
+        t=time.time()
+        rv=f(*args,**kw)
+        rows=0
+        if queries==0:
+            # a fetch: count what came back
+            if isinstance(rv,list):
+                rows=len(rv)
+            elif rv is not None:
+                rows=1
+        self.stats.query(method,queries,rows,time.time()-t)
+        return rv
+
+    def execute(self,*args,**kw):
+        self.__dict__['method']=sys._getframe(1).f_code.co_name
+        rv=self.timed(self.method,1,self.curs.execute,*args,**kw)
+        if rv is self.curs:
+            return self
+        return rv
+
+    def callproc(self,*args,**kw):
+        method=sys._getframe(1).f_code.co_name
+        return self.timed(method,1,self.curs.callproc,*args,**kw)
+
+    def fetchone(self):
+        return self.timed(self.method,0,self.curs.fetchone)
+
+    def fetchmany(self,*args):
+        return self.timed(self.method,0,self.curs.fetchmany,*args)
+
+    def fetchall(self):
+        return self.timed(self.method,0,self.curs.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        row=self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
 
 #-----------------------------------------------------------------------
 #  Trans -- translator base class
@@ -31,10 +429,67 @@ tmplEnums=(
 
 class Trans:
     templates={}
-    def __init__(self,conn,output):
+    arraysize=1000	# rows per round trip for dictionary queries
+    bulksize=500	# packages per bulk query; oracle allows 1000 in an in list
+
+    # the bulk dictionary queries; %s restricts the package names.
+    # A sweep merges them by package name in python's string order,
+    # so they sort by byte value whatever the session's NLS_SORT.
+    procsql="""
+            select ap.object_name, ap.procedure_name,
+                   ap.deterministic, ap.result_cache
+                from all_procedures ap, all_objects ao
+                where ap.object_name = ao.object_name
+                  and ap.object_type='PACKAGE'
+                  and ao.object_type='PACKAGE'
+                  and ap.procedure_name is not NULL
+                  and ap.owner = :owner
+                  and ao.owner = :owner
+                  and %s
+                  order by nlssort(ap.object_name,'NLS_SORT=BINARY'),
+                           ap.procedure_name
+                """
+    argsql="""
+            select package_name, object_name, argument_name, data_type,
+                   position, sequence, data_level, in_out,
+                   data_length, data_precision, data_scale
+              from all_arguments
+              where owner=:owner
+                and package_name in (select object_name from all_objects
+                                     where owner=:owner
+                                       and object_type='PACKAGE')
+                and %s
+              order by nlssort(package_name,'NLS_SORT=BINARY'),
+                       object_name, overload, sequence
+              """
+    srcsql="""
+            select name, text from all_source
+              where owner=:owner and type='PACKAGE'
+                and %s
+              order by nlssort(name,'NLS_SORT=BINARY'), line"""
+
+    # doc comment patterns, see parsedoc
+    declre=re.compile(r'^[\s]+(function|procedure)[\s\+]([^\s(;]+)')
+    asre=re.compile(r'^[\s]*(AS|IS)[\s]*$',re.IGNORECASE)
+    blabre=re.compile(r'^[\s]*[-][-][+][\s](.*)')
+    cachere=re.compile(r'^[\s]*@cache[\s]*$')
+    def __init__(self,conn,output,stats=None):
         self.output=output
         self.conn=conn
-        self.curs=self.conn.cursor()
+        self.stats=stats	# a Stats, with --stats
+        self.curs=None
+        if conn is not None:
+            self.curs=self.cursor()
+            self.curs.arraysize=self.arraysize
+        self.pkgs={}	# (owner,package) -> Pdat
+        self.snapshot=None	# requested name -> Pdat, with no connection
+
+    def cursor(self):
+        """a new cursor, instrumented when collecting stats"""
+        curs=self.conn.cursor()
+        if self.stats:
+            curs=StatCursor(curs,self.stats)
+        return curs
 
     def println (self,line):
         """print a line to the selected output"""
@@ -44,189 +499,514 @@ class Trans:
         """print a line to stderr"""
         sys.stderr.write(line+'\n')
 
+    def getpackage(self,owner,package_name):
+        """get the package model, loading it on first use"""
+        key=(owner,package_name)
+        if not self.pkgs.has_key(key):
+            self.loadpackages(owner,[package_name])
+        return self.pkgs[key]
+
+    def loadpackages(self,owner,package_names=None):
+        """load the package model for some (or all) of an owner's packages
+
+        This fetches all_procedures and all_arguments in one bulk query
+        each, however many packages or procedures there are.
+        """
+        binds={'owner':owner}
+        restrict='%s is not null'
+        if package_names is not None:
+            names=[]
+            for i in range(len(package_names)):
+                binds['p%d'%i]=package_names[i]
+                names.append(':p%d'%i)
+            restrict='%%s in (%s)'%','.join(names)
+            for p in package_names:
+                self.pkgs[(owner,p)]=Pdat(owner,p)
+
+        self.curs.execute(self.procsql%(restrict%'ap.object_name'),binds)
+        for row in self.curs:
+            key=(owner,row[0])
+            if not self.pkgs.has_key(key):
+                self.pkgs[key]=Pdat(owner,row[0])
+            self.pkgs[key].addproc(*row[1:])
+
+        self.curs.execute(self.argsql%(restrict%'package_name'),binds)
+        for row in self.curs:
+            key=(owner,row[0])
+            if not self.pkgs.has_key(key):
+                self.pkgs[key]=Pdat(owner,row[0])
+            self.pkgs[key].addarg(row[1],row[2:])
+
+    def getargs(self,owner,objname,package_name):
+        """get the all_arguments rows of a procedure, in sequence order"""
+        return self.getpackage(owner,package_name).args.get(objname,[])
+
     def getprocedures(self,owner,package_name):
         """get a list of all public procedures and functions in a package"""
-        self.curs.execute("""
-            select ap.procedure_name
-                from all_procedures ap, all_objects ao
-                where ap.object_name = ao.object_name
-                  and ao.object_type='PACKAGE'
-                  and ap.object_name=:package_name
-                  and ap.procedure_name is not NULL
-                  and ap.owner = :owner
-                  and ao.owner = :owner
-                  order by ap.procedure_name
-                """,package_name=package_name,owner=owner)
-        rv=[i[0] for i in self.curs]
-        return rv
+        return list(self.getpackage(owner,package_name).procs)
 
     def isfunc(self,owner,objname,package_name):
         """is this object a function?"""
-        self.curs.execute("""
-            select count(data_type)
-              from all_arguments
-              where object_name=:objname
-              and owner=:owner
-              and data_type is not null
-              and package_name=:package_name
-              and position=0
-              and argument_name is null""",
-            objname=objname,package_name=package_name,owner=owner)
-        return_types=self.curs.fetchone()[0]
+        return_types=0
+        for row in self.getargs(owner,objname,package_name):
+            if row[aType] is not None and row[aPosition]==0 and row[aName] is None:
+                return_types+=1
         return return_types
 
     def getparms(self,owner,objname,package_name):
         """get the parameter list for a procedure"""
-        rv=[]
-        self.curs.execute("""
-            select argument_name
-              from all_arguments
-              where object_name=:objname
-                and owner=:owner
-                and argument_name is not null
-                and package_name=:package_name
-              order by position""",objname=objname,package_name=package_name,owner=owner)
-        rv=[i[0].lower() for i in self.curs]
+        rows=[row for row in self.getargs(owner,objname,package_name)
+              if row[aName] is not None]
+        rows.sort(lambda a,b: cmp(a[aPosition],b[aPosition]))
+        rv=[row[aName].lower() for row in rows]
         return rv
 
+    def getparmmodes(self,owner,objname,package_name):
+        """get the IN/OUT mode of each parameter, in parameter order"""
+        rows=[row for row in self.getargs(owner,objname,package_name)
+              if row[aName] is not None]
+        rows.sort(lambda a,b: cmp(a[aPosition],b[aPosition]))
+        return [row[aInOut] for row in rows]
+
+    def getparmtypes(self,owner,objname,package_name):
+        """get the data type of each parameter, in parameter order"""
+        rows=[row for row in self.getargs(owner,objname,package_name)
+              if row[aName] is not None]
+        rows.sort(lambda a,b: cmp(a[aPosition],b[aPosition]))
+        return [row[aType] for row in rows]
+
     def getarrayparms(self,owner,objname,package_name):
         """get the list of parameters of array type"""
         rv={}
-        self.curs.execute("""select argument_name, data_type from all_arguments
-                             where package_name=:package_name
-                             and owner=:owner
-                             and object_name=:objname
-                             order by sequence""",objname=objname,package_name=package_name,owner=owner)
-
         current_arg = ""
         pick_next = False
-        for row in self.curs:
-            if row[1] == "PL/SQL TABLE":
-                current_arg = row[0]
+        for row in self.getargs(owner,objname,package_name):
+            if row[aType] == "PL/SQL TABLE":
+                current_arg = row[aName]
                 pick_next = True
-            if row[0] is None and pick_next:
-                rv[current_arg.lower()]=row[1]
+            if row[aName] is None and pick_next:
+                rv[current_arg.lower()]=row[aType]
                 pick_next = False
         return rv
 
     def getarrayindices(self,owner,objname,package_name):
         """get the list of parameters of array type"""
         rv={}
-        self.curs.execute("""select argument_name, data_type, position from all_arguments
-                             where package_name=:package_name
-                             and owner=:owner
-                             and object_name=:objname
-                             order by sequence""",objname=objname,package_name=package_name,owner=owner)
-
         position = 0
         pick_next = False
-        for row in self.curs:
-            if row[1] == "PL/SQL TABLE":
-                position = row[2]
+        for row in self.getargs(owner,objname,package_name):
+            if row[aType] == "PL/SQL TABLE":
+                position = row[aPosition]
                 pick_next = True
-            if row[0] is None and pick_next:
-                rv[position]=row[1]
+            if row[aName] is None and pick_next:
+                rv[position]=row[aType]
                 pick_next = False
         return rv
 
     def hasoutputparms(self,owner,objname,package_name):
         """Tell if a procedure has array out or in out parameters"""
-        result = False
-        self.curs.execute("""
-            select count(argument_name)
-            from all_arguments
-            where object_name=:objname
-               and owner=:owner
-               and data_type='PL/SQL TABLE'
-               and (in_out='OUT' or in_out='IN/OUT')
-               and package_name=:package_name""",objname=objname.upper(),package_name=package_name,owner=owner)
-        for row in self.curs:
-            if row[0] > 0:
+        for row in self.getargs(owner,objname.upper(),package_name):
+            if row[aName] is not None and row[aType]=='PL/SQL TABLE' and \
+               row[aInOut] in ('OUT','IN/OUT'):
                 return True
         return False
 
+    def resolve(self,package_name):
+        """resolve a package name to (synonym, owner, real name)"""
+        curs = self.cursor()
+        synonym = package_name
+        _, _, owner, realname, part2, dblink, part1_type, object_number = \
+             curs.callproc("DBMS_UTILITY.NAME_RESOLVE", (package_name, 1, " "*30, " "*30, " "*30, " "*30, 0, 0))
+        if synonym == realname and self.conn.username.upper() == owner:
+            synonym = None
+        assert part2 is None
+        return synonym,owner,realname
+
+    def resolvenames(self,package_names):
+        """resolve a list of package names to (synonym, owner, real name)
+
+        The user's own packages, and private and public synonyms for
+        packages, are looked up with one query each.  Anything else
+        (synonym chains, missing packages) goes to resolve().
+        """
+        username=self.conn.username.upper()
+        binds={'usr':username}
+        for i in range(len(package_names)):
+            binds['p%d'%i]=package_names[i]
+        names=','.join([':p%d'%i for i in range(len(package_names))])
+
+        found={}
+        rank={}		# 0 own package, 1 private synonym, 2 public synonym
+        self.curs.execute("""
+            select object_name
+              from all_objects
+              where owner=:usr
+                and object_type='PACKAGE'
+                and object_name in (%s)"""%names,binds)
+        for (name,) in self.curs:
+            found[name]=(None,username,name)
+            rank[name]=0
+        self.curs.execute("""
+            select s.owner, s.synonym_name, s.table_owner, s.table_name
+              from all_synonyms s, all_objects o
+              where s.synonym_name in (%s)
+                and s.owner in (:usr,'PUBLIC')
+                and s.db_link is null
+                and o.owner=s.table_owner
+                and o.object_name=s.table_name
+                and o.object_type='PACKAGE'"""%names,binds)
+        for synowner,synname,owner,realname in self.curs:
+            r=synowner=='PUBLIC' and 2 or 1
+            if rank.get(synname,3)>r:
+                found[synname]=(synname,owner,realname)
+                rank[synname]=r
+
+        rv=[]
+        for p in package_names:
+            if found.has_key(p):
+                rv.append(found[p])
+            else:
+                rv.append(self.resolve(p))
+        return rv
+
+    def sweep(self,owner):
+        """generate the models of all of an owner's packages, in name order
+
+        Procedures, arguments and doc comments are each read in a single
+        streamed query for the whole schema, one package at a time, so
+        memory stays bounded by the largest package.
+        """
+        username=self.conn.username.upper()
+        synonyms={}
+        if owner!=username:
+            # call foreign packages through the synonyms we can see
+            self.curs.execute("""
+                select owner, synonym_name, table_name
+                  from all_synonyms
+                  where table_owner=:owner
+                    and owner in (:usr,'PUBLIC')
+                    and db_link is null
+                  order by owner desc""",owner=owner,usr=username)
+            for synowner,synname,table_name in self.curs:
+                if not synonyms.has_key(table_name) or synowner!='PUBLIC':
+                    synonyms[table_name]=synname
+
+        names=self.cursor()
+        names.arraysize=self.arraysize
+        names.execute("""
+            select object_name
+              from all_objects
+              where owner=:owner and object_type='PACKAGE'
+              order by nlssort(object_name,'NLS_SORT=BINARY')""",
+            owner=owner)
+        groups=[]
+        for sql,column in ((self.procsql,'ap.object_name'),
+                           (self.argsql,'package_name'),
+                           (self.srcsql,'name')):
+            curs=self.cursor()
+            curs.arraysize=self.arraysize
+            curs.execute(sql%('%s is not null'%column),owner=owner)
+            groups.append(Rowgroups(curs))
+        procs,args,src=groups
+
+        for (name,) in names:
+            pdat=Pdat(owner,name)
+            for row in procs.take(name):
+                pdat.addproc(*row[1:])
+            for row in args.take(name):
+                pdat.addarg(row[1],row[2:])
+            doctext,pdat.memberdocs,cached=self.parsedoc(
+                row[1] for row in src.take(name))
+            pdat.cached.extend(cached)
+            pdat.synonym=synonyms.get(name)
+            if pdat.synonym:
+                pdat.callname=pdat.synonym
+            elif owner!=username:
+                pdat.callname='%s.%s'%(owner,name)
+            pdat.doc=self.docbeautify(
+                self.docheader(pdat.synonym,owner,name)+doctext,1)
+            yield pdat
+
+    def getclassbatch(self,package_names):
+        """resolve a list of package names and gather everything needed
+        to emit them, with one bulk query per owner for each of
+        procedures, arguments and doc comments"""
+        t=time.time()
+        resolved=self.resolvenames(package_names)
+        byowner={}
+        for synonym,owner,realname in resolved:
+            byowner.setdefault(owner,{})[realname]=1
+        docs={}
+        for owner,names in byowner.items():
+            names=names.keys()
+            missing=[n for n in names if not self.pkgs.has_key((owner,n))]
+            if missing:
+                self.loadpackages(owner,missing)
+            for realname,doc in self.getdocs(owner,names).items():
+                docs[(owner,realname)]=doc
+
+        username=self.conn.username.upper()
+        rv=[]
+        for synonym,owner,realname in resolved:
+            # one model per requested name, sharing the dictionary rows
+            pdat=copy.copy(self.getpackage(owner,realname))
+            doctext,pdat.memberdocs,cached=docs[(owner,realname)]
+            pdat.cached=pdat.cached+cached
+            pdat.synonym=synonym
+            if synonym:
+                pdat.callname=synonym
+            elif owner!=username:
+                pdat.callname='%s.%s'%(owner,realname)
+            pdat.doc=self.docbeautify(
+                self.docheader(synonym,owner,realname)+doctext,1)
+            rv.append(pdat)
+        if self.stats:
+            t=(time.time()-t)/len(rv)
+            for pdat in rv:
+                self.stats.package(pdat.name,t)
+        return rv
+
+    def getclass(self,package_name):
+        """resolve a package name and gather everything needed to emit it"""
+        return self.getclassbatch([package_name])[0]
+
+    def getddltimes(self,packages):
+        """get last_ddl_time of packages, a list of (owner, name)"""
+        rv={}
+        for i in range(0,len(packages),self.bulksize):
+            chunk=packages[i:i+self.bulksize]
+            binds={}
+            for j in range(len(chunk)):
+                binds['o%d'%j],binds['p%d'%j]=chunk[j]
+            self.curs.execute("""
+                select owner, object_name, last_ddl_time
+                  from all_objects
+                  where object_type='PACKAGE'
+                    and (%s)"""%
+                ' or '.join(['(owner=:o%d and object_name=:p%d)'%(j,j)
+                             for j in range(len(chunk))]),binds)
+            for owner,name,ddltime in self.curs:
+                rv[(owner,name)]=ddltime
+        return rv
+
+    def getclasses(self,package_names,jobs=1,pool=None,cache=None):
+        """generate the package models for a list of names, in order
+
+        Models in cache whose package has not changed since they were
+        introspected are used as is; one query validates all of them.
+        When working from a snapshot, the database is not used at all.
+        """
+        if self.snapshot is not None:
+            for p in package_names:
+                yield self.snapshot[p]
+            return
+
+        if cache is None or not package_names:
+            for pdat in self.introspect(package_names,jobs,pool):
+                yield pdat
+            return
+
+        username=self.conn.username.upper()
+        # the time of a package reached through a synonym is under its
+        # owner and real name, so resolve the names not cached yet
+        packages={}
+        uncached=[]
+        for p in package_names:
+            pdat=cache.get(username,p)
+            if pdat:
+                packages[(pdat.owner,pdat.name)]=1
+            else:
+                uncached.append(p)
+        if uncached:
+            for synonym,owner,realname in self.resolvenames(uncached):
+                packages[(owner,realname)]=1
+        ddltimes=self.getddltimes(packages.keys())
+
+        stale=[]
+        for p in package_names:
+            pdat=cache.get(username,p)
+            if not pdat or pdat.ddltime is None or \
+               ddltimes.get((pdat.owner,pdat.name))!=pdat.ddltime:
+                stale.append(p)
+
+        fresh=self.introspect(stale,jobs,pool)
+        stale=dict.fromkeys(stale)
+        for p in package_names:
+            if stale.has_key(p):
+                pdat=fresh.next()
+                # this time was read before introspection, so a
+                # concurrent change can only cause a needless refresh
+                pdat.ddltime=ddltimes.get((pdat.owner,pdat.name))
+                cache.put(username,p,pdat)
+            else:
+                pdat=cache.get(username,p)
+            yield pdat
+
+    def introspect(self,package_names,jobs=1,pool=None):
+        """generate the package models for a list of names, in order
+
+        With more than one job, the names are split into a batch per
+        worker thread, at most bulksize each, and the batches are
+        introspected at the same time, each worker on its own session
+        from pool.
+        """
+        if jobs<=1 or pool is None or len(package_names)<2:
+            for i in range(0,len(package_names),self.bulksize):
+                for pdat in self.getclassbatch(package_names[i:i+self.bulksize]):
+                    yield pdat
+            return
+
+        size=min(self.bulksize,(len(package_names)+jobs-1)/jobs)
+        work=Queue.Queue()
+        batches=range(0,len(package_names),size)
+        for i in batches:
+            work.put((i,package_names[i:i+size]))
+        done=threading.Condition()
+        results={}
+
+        def worker():
+            conn=pool.acquire()
+            try:
+                trans=Trans(conn,None,self.stats)
+                while 1:
+                    try:
+                        i,names=work.get_nowait()
+                    except Queue.Empty:
+                        break
+                    try:
+                        rv=[(pdat,None) for pdat in trans.getclassbatch(names)]
+                    except:
+                        rv=[(None,sys.exc_info())]*len(names)
+                    done.acquire()
+                    for j in range(len(names)):
+                        results[i+j]=rv[j]
+                    done.notify()
+                    done.release()
+            finally:
+                pool.release(conn)
+
+        threads=[]
+        for j in range(min(jobs,len(batches))):
+            t=threading.Thread(target=worker)
+            t.setDaemon(True)
+            t.start()
+            threads.append(t)
+
+        for i in range(len(package_names)):
+            done.acquire()
+            while not results.has_key(i):
+                done.wait()
+            pdat,exc=results.pop(i)
+            done.release()
+            if exc:
+                raise exc[0],exc[1],exc[2]
+            yield pdat
+        for t in threads:
+            t.join()
+
     def docbeautify(self,s,lev):
         """beautifully indent a block of text for a doc string"""
         spaces='    '*lev
         s='\n'.join([(spaces + x).rstrip() for x in s.splitlines()])
         return s
 
-    def getdoc(self,synonym, owner, pkgname):
-        """build up a doc string for this class and its members"""
-        self.memberdocs={}
-        decl=re.compile(r'^[\s]+(function|procedure)[\s\+]([^\s(;]+)')
-        asline=re.compile(r'^[\s]*(AS|IS)[\s]*$',re.IGNORECASE)
-        blab=re.compile(r'^[\s]*[-][-][+][\s](.*)')
+    def docheader(self,synonym,owner,pkgname):
+        """the generated part of a class doc string"""
         t=''
         t+='class %s -- interface for package %s%s.%s\n'%\
              ((synonym or pkgname).capitalize(),
               synonym and "(synonym) " or "",
-              self.conn.username.upper(),synonym or pkgname)
+              synonym and self.conn.username.upper() or owner,
+              synonym or pkgname)
         t+='\n'
         t+='*** This is a generated class. DO NOT MODIFY! ***\n'
         #t+=' '.join(sys.argv)
         #t+='\n'
         t+='\n'
-        self.curs.execute("""select text from all_source where name=:name
-                             and type='PACKAGE' and owner=:owner order by line""", name=pkgname,owner=owner)
+        return t
+
+    def parsedoc(self,lines):
+        """parse the doc comments out of a package's source lines
+
+        Returns (package doc text, member docs, cached functions).  The
+        package doc is the "--+" lines up to the AS/IS line, a member doc
+        is the "--+" lines preceding its declaration.  A "--+ @cache"
+        line marks the function's results as cacheable.
+        """
+        blab=self.blabre.match
+        asline=self.asre.match
+        decl=self.declre.match
+        cache=self.cachere.match
+        t=[]
+        memberdocs={}
+        cached=[]
+        lines=iter(lines)
 
         # first, get the package docs
-        for r in self.curs:
-            s=r[0]
-            m=blab.match(s)
-            if m:
-                t+=m.group(1)
-                t+='\n'
-                continue
-            m=asline.match(s)
+        for s in lines:
+            m=blab(s)
             if m:
-                t+='\n'
+                t.append(m.group(1)+'\n')
+            elif asline(s):
+                t.append('\n')
                 break
 
         # now, get the procedure docs
-        blabbage=''
-        for r in self.curs:
-            s=r[0]
-            m=blab.match(s)
+        blabbage=[]
+        pragma=False
+        for s in lines:
+            m=blab(s)
             if m:
-                blabbage+=m.group(1)
-                blabbage+='\n'
+                if cache(m.group(1)):
+                    pragma=True
+                else:
+                    blabbage.append(m.group(1)+'\n')
                 continue
-            m=decl.match(s)
+            m=decl(s)
             if m:
-                decltype=m.group(1)
-                declname=m.group(2)
-                self.memberdocs[declname]=self.docbeautify(blabbage,2)
-                blabbage=''
-                continue
-        t=self.docbeautify(t,1)
-        return t
+                memberdocs[m.group(2)]=self.docbeautify(''.join(blabbage),2)
+                if pragma and m.group(1).lower()=='function':
+                    cached.append(m.group(2).upper())
+                blabbage=[]
+                pragma=False
+        return ''.join(t),memberdocs,cached
+
+    def getdocs(self,owner,pkgnames):
+        """get the doc comments of several packages in one pass
 
-    def getfunctype(self,owner,objname):
+        Returns a dict of package name -> parsedoc() results.
+        """
+        binds={'owner':owner}
+        for i in range(len(pkgnames)):
+            binds['p%d'%i]=pkgnames[i]
+        self.curs.execute(self.srcsql%('name in (%s)'%
+            ','.join([':p%d'%i for i in range(len(pkgnames))])),binds)
+        docs={}
+        for p in pkgnames:
+            docs[p]=('',{},[])
+        for name,rows in itertools.groupby(self.curs,lambda row:row[0]):
+            docs[name]=self.parsedoc(row[1] for row in rows)
+        return docs
+
+    def getdoc(self,synonym, owner, pkgname):
+        """build up a doc string for this class and its members"""
+        t,self.memberdocs,cached=self.getdocs(owner,[pkgname])[pkgname]
+        return self.docbeautify(self.docheader(synonym,owner,pkgname)+t,1)
+
+    def getfunctype(self,owner,objname,package_name):
         """get the return type of a function"""
-        self.curs.execute("""
-            select data_type
-              from all_arguments
-              where object_name=:objname
-                and owner=:owner
-                and argument_name is null""",objname=objname,owner=owner)
-        dt=self.curs.fetchone()[0]
-        return dt
+        for row in self.getargs(owner,objname,package_name):
+            if row[aName] is None and row[aPosition]==0:
+                return row[aType]
+        return None
 
     def getparmtype(self,owner,pkgname,procname,parmname):
         """get a parameter type"""
         parmname=parmname.upper()
-        self.curs.execute("""
-            select data_type
-              from all_arguments
-              where package_name=:pkgname and object_name=:procname
-                and owner=:owner
-                and argument_name=:parmname""",
-                pkgname=pkgname,procname=procname,parmname=parmname,owner=owner)
-
-        r=self.curs.fetchone()
-        dt=r[0]
-        return dt
+        for row in self.getargs(owner,procname,pkgname):
+            if row[aName]==parmname:
+                return row[aType]
+        return None
 
     def dump(self,pkglist):
         """dump what we know, mainly for debugging"""
@@ -253,16 +1033,12 @@ class Trans:
 
 pytmpl={}
 pytmpl[class0]="""\
-class %s:
+class %s(Package):
     \"\"\"
 %s    \"\"\"
 
-    #------------------------------------------------------
-    def __init__(self,curs):
-        self.curs=curs
-        # do not set autocommit if your are not
-        # writing an appserver!
-        self.autocommit=False
+    # results of the cached functions, shared by all instances
+    caches={%s}
 """
 pytmpl[proc0]="""\
     #------------------------------------------------------
@@ -271,25 +1047,25 @@ pytmpl[proc0]="""\
 %s
         \"\"\"
 %s
-        result = self.curs.callproc('%s.%s'%s)
-        if self.autocommit:
-            conn.commit()
+%s        if self.tagging:
+            self._tag('%s')
+        self.curs.execute(%s%s)
+        result = [_b.getvalue() for _b in self.curs.bindvars]
+%s        if self.autocommit:
+            self.curs.connection.commit()
         return result
 """
 pytmpl[procv0]="""\
     #------------------------------------------------------
-    def %s(self,parmlist):
+    def %s(self,parmlist,batchsize=None,batcherrors=False):
         \"\"\"
 %s
         \"\"\"
-%s        arguments = []
-        for i in range(len(parmlist)):
-            dict = {}
-%s
-            arguments.append(dict)
-        result = self.curs.executemany("begin %s.%s(%s); end;", arguments)
+        if self.tagging:
+            self._tag('%s')
+        result = %s
         if self.autocommit:
-            conn.commit()
+            self.curs.connection.commit()
         return result
 """
 pytmpl[func0]="""\
@@ -299,11 +1075,29 @@ pytmpl[func0]="""\
 %s
         \"\"\"
 %s
-        rv=self.curs.callfunc('%s.%s',%s%s)
-        if self.autocommit:
-            conn.commit()
+%s%s        if self.tagging:
+            self._tag('%s')
+        self.curs.execute(%s,%s)
+        rv=%s.getvalue()
+%s        if self.autocommit:
+            self.curs.connection.commit()
         return rv
 """
+pytmpl[curs0]="""\
+    #------------------------------------------------------
+    def %s(self%s,arraysize=None):
+        \"\"\"
+%s
+        (autogenerated %s)
+        \"\"\"
+%s
+%s        if self.tagging:
+            self._tag('%s')
+        self.curs.execute(%s,%s)
+        if self.autocommit:
+            self.curs.connection.commit()
+        return %s
+"""
 pytmpl[func1]="""\
     #------------------------------------------------------
     def %s(self%s):
@@ -314,9 +1108,1433 @@ pytmpl[func1]="""\
         raise TypeError("Unsupported Oracle Data Type: %s") 
 """
 pytmpl[file0] = """\
+import os
+import re
+import sys
+import json
+import time
+import array
+import types
+import bisect
+import decimal
+import itertools
+import threading
+import collections
 import cx_Oracle
+
+class ResultCache:
+    \"\"\"
+    the results of a DETERMINISTIC or RESULT_CACHE function, by
+    database (dsn and user) and arguments
+
+    At most maxsize results are kept, the least recently used going
+    first, each for at most ttl seconds (None: until it is pushed out).
+    hits and misses count the lookups; invalidate(*args) forgets the
+    result for some arguments on every database, clear() forgets them
+    all.
+    \"\"\"
+
+    def __init__(self,maxsize=1000,ttl=None):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self.hits=0
+        self.misses=0
+        self._results=collections.OrderedDict()	# (db,)+args -> (value, expiry)
+        self._lock=threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self,key,default=None):
+        \"\"\"the result for a (database,)+arguments tuple, or default\"\"\"
+        self._lock.acquire()
+        try:
+            entry=self._results.pop(key,None)
+            if entry is None or (entry[1] is not None and entry[1]<time.time()):
+                self.misses+=1
+                return default
+            self._results[key]=entry	# now the most recently used
+            self.hits+=1
+            return entry[0]
+        finally:
+            self._lock.release()
+
+    def put(self,key,value):
+        \"\"\"remember the result for a (database,)+arguments tuple\"\"\"
+        expiry=None
+        if self.ttl is not None:
+            expiry=time.time()+self.ttl
+        self._lock.acquire()
+        try:
+            self._results.pop(key,None)
+            self._results[key]=(value,expiry)
+            while len(self._results)>self.maxsize:
+                self._results.popitem(False)
+        finally:
+            self._lock.release()
+
+    def invalidate(self,*args):
+        \"\"\"forget the result for these arguments, on every database\"\"\"
+        self._lock.acquire()
+        for key in [key for key in self._results if key[1:]==args]:
+            del self._results[key]
+        self._lock.release()
+
+    def clear(self):
+        \"\"\"forget every result\"\"\"
+        self._lock.acquire()
+        self._results.clear()
+        self._lock.release()
+
+class Pooled:
+    \"\"\"
+    a generated class shared by many threads, over a session pool
+
+    Pooled(Keyword,pool) has the methods of Keyword.  Each call takes
+    an idle session, or one from the cx_Oracle session pool, and is
+    committed; the session is then idle again, kept with its wrapper
+    so that later calls reuse the wrapper's variables.  At most maxidle
+    sessions are kept idle, each for at most idletime seconds; the
+    others go back to the pool.  A call that fails gives its session,
+    and the idle ones, back at once, in case the database went away.
+    batch() holds a session until the batch is sent.
+
+    With perthread=True, each thread instead keeps one session, and its
+    transaction, until release(); commit() and rollback() act on the
+    calling thread's session, and autocommit=True commits every call.
+    \"\"\"
+
+    def __init__(self,wrapper,pool,perthread=False,autocommit=False,
+                 maxidle=2,idletime=60):
+        self.wrapper=wrapper
+        self.pool=pool
+        self.perthread=perthread
+        self.autocommit=autocommit
+        self.maxidle=maxidle	# sessions kept idle between calls
+        self.idletime=idletime	# seconds a session is kept idle
+        self._local=threading.local()
+        self._sessions=[]	# the sessions taken from the pool
+        self._idle=[]		# (wrapper, idle since) of the sessions
+				# between calls, the longest idle first
+        self._lock=threading.Lock()
+
+    def __getattr__(self,name):
+        if hasattr(self.wrapper,'_methods') and not name.startswith('_') \
+           and not hasattr(self.wrapper,name):
+            _loadmethod(self.wrapper,name)	# a --lazy class
+        method=getattr(self.wrapper,name)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(name)
+        def call(*args,**kw):
+            return self._call(name,args,kw)
+        call.__doc__=method.__doc__
+        self.__dict__[name]=call
+        return call
+
+    def _session(self):
+        \"\"\"this thread's session, and wrapper over it\"\"\"
+        w=getattr(self._local,'wrapper',None)
+        if w is None:
+            conn=self.pool.acquire()
+            conn.autocommit=self.autocommit
+            self._lock.acquire()
+            self._sessions.append(conn)
+            self._lock.release()
+            w=self._local.wrapper=self.wrapper(conn.cursor())
+        return w
+
+    def _take(self):
+        \"\"\"the wrapper of an idle session, or of a new one\"\"\"
+        w=None
+        self._lock.acquire()
+        try:
+            expired=time.time()-self.idletime
+            stale=[]
+            while self._idle and self._idle[0][1]<expired:
+                stale.append(self._idle.pop(0)[0])
+            if self._idle:
+                w=self._idle.pop()[0]
+        finally:
+            self._lock.release()
+        self._release(stale)
+        if w is not None:
+            return w
+        conn=self.pool.acquire()
+        conn.autocommit=True
+        self._lock.acquire()
+        self._sessions.append(conn)
+        self._lock.release()
+        return self.wrapper(conn.cursor())
+
+    def _giveback(self,w,failed=False):
+        \"\"\"make a wrapper's session idle again, or give it back to the
+        pool if enough are idle; after a failure give back the idle ones
+        too, which may be as dead as this one\"\"\"
+        conn=w.curs.connection
+        stale=[]
+        self._lock.acquire()
+        try:
+            if conn not in self._sessions:
+                return			# given back by close()
+            if not failed and len(self._idle)<self.maxidle:
+                self._idle.append((w,time.time()))
+                return
+            if failed:
+                stale=[idle for idle,t in self._idle]
+                self._idle=[]
+        finally:
+            self._lock.release()
+        self._release(stale+[w])
+
+    def _release(self,wrappers):
+        \"\"\"give the sessions of wrappers taken off the idle list, or
+        out of use, back to the pool\"\"\"
+        for w in wrappers:
+            conn=w.curs.connection
+            self._lock.acquire()
+            try:
+                if conn not in self._sessions:
+                    continue
+                self._sessions.remove(conn)
+            finally:
+                self._lock.release()
+            try:
+                self.pool.release(conn)
+            except cx_Oracle.DatabaseError:
+                pass			# a dead session
+
+    def _call(self,name,args,kw):
+        if self.perthread:
+            return getattr(self._session(),name)(*args,**kw)
+        w=self._take()
+        try:
+            rv=getattr(w,name)(*args,**kw)
+        except:
+            self._giveback(w,True)
+            raise
+        if isinstance(rv,types.GeneratorType):
+            return self._releasing(rv,w)
+        self._giveback(w)
+        return rv
+
+    def _releasing(self,rows,w):
+        \"\"\"stream rows, then make their session idle again\"\"\"
+        try:
+            for row in rows:
+                yield row
+        except:
+            self._giveback(w,True)
+            raise
+        self._giveback(w)
+
+    def batch(self):
+        \"\"\"calls on the returned Batch are sent in one round trip, over
+        one session held until then\"\"\"
+        if self.perthread:
+            return self._session().batch()
+        return _PooledBatch(self)
+
+    def commit(self):
+        \"\"\"commit this thread's session\"\"\"
+        self._session().curs.connection.commit()
+
+    def rollback(self):
+        \"\"\"roll back this thread's session\"\"\"
+        self._session().curs.connection.rollback()
+
+    def release(self):
+        \"\"\"give this thread's session back to the pool\"\"\"
+        w=getattr(self._local,'wrapper',None)
+        if w is not None:
+            self._local.wrapper=None
+            self._lock.acquire()
+            self._sessions.remove(w.curs.connection)
+            self._lock.release()
+            self.pool.release(w.curs.connection)
+
+    def close(self):
+        \"\"\"give back the sessions of all threads\"\"\"
+        self._lock.acquire()
+        sessions,self._sessions=self._sessions,[]
+        self._idle=[]
+        self._lock.release()
+        for conn in sessions:
+            self.pool.release(conn)
+
+class LobReader:
+    \"\"\"
+    a LOB too long to return whole, read as it is consumed
+
+    Iterating gives the content a piece at a time, read(n) reads like
+    a file.  Each round trip reads chunks times the LOB's chunk size.
+    \"\"\"
+
+    chunks=16
+
+    def __init__(self,lob,data):
+        self.lob=lob
+        self.readsize=lob.getchunksize()*self.chunks
+        self.buffer=data			# what was read ahead
+        self.offset=len(self.buffer)+1		# where the next read starts
+
+    def __iter__(self):
+        while True:
+            data=self.read(self.readsize)
+            if not data:
+                return
+            yield data
+
+    def size(self):
+        \"\"\"the length of the whole LOB\"\"\"
+        return self.lob.size()
+
+    def read(self,n=-1):
+        \"\"\"up to n more bytes or characters, or all the rest\"\"\"
+        pieces=[self.buffer]
+        have=len(self.buffer)
+        while n<0 or have<n:
+            data=self.lob.read(self.offset,self.readsize)
+            if not data:
+                break
+            self.offset+=len(data)
+            pieces.append(data)
+            have+=len(data)
+        data=pieces[0][:0].join(pieces)
+        if n<0:
+            n=len(data)
+        data,self.buffer=data[:n],data[n:]
+        return data
+
+class Batch:
+    \"\"\"
+    calls recorded to be sent in one round trip
+
+        with keyword.batch() as b:
+            b.add(22,'blue')
+            b.delet(22,'red')
+            f=b.add(23,'green')
+        f.result()
+
+    Calls of a generated class's methods (not the _V, _iter, _L or
+    _columns forms) are put together into one anonymous PL/SQL block,
+    sent when the with statement ends or by send().  Each call returns
+    a BatchResult whose result() is what the method would have returned.
+    \"\"\"
+
+    bindre=re.compile(r':(\\d+)')
+
+    def __init__(self,pkg):
+        self.pkg=pkg
+        modname=getattr(pkg.__class__,'_methods',pkg.__class__.__module__)
+        __import__(modname)
+        self.module=sys.modules[modname]
+        self.statements=getattr(pkg.__class__,'_statements',None)	# --runtime
+        self.prefix='_%s__'%pkg.__class__.__name__.upper()
+        self.calls=[]		# the calls, as PL/SQL statements
+        self.binds=[]		# their bind values and variables
+        self.results=[]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,type,value,traceback):
+        if type is None:
+            self.send()
+
+    def __getattr__(self,name):
+        if self.statements is not None:
+            stmt,sizes=self.statements.get(name,(None,None))
+        else:
+            stmt=getattr(self.module,self.prefix+name.upper(),None)
+            sizes=getattr(self.module,self.prefix+name.upper()+'_T',None)
+        if name.startswith('_') or stmt is None:
+            raise AttributeError(name)
+        def call(*args):
+            return self._record(name,stmt,sizes,args)
+        return call
+
+    def _record(self,name,stmt,sizes,args):
+        \"\"\"add a call to the block\"\"\"
+        func=stmt.startswith('begin :1 :=')
+        values=list(args)
+        if func:
+            values.insert(0,None)
+        if func and not (sizes and sizes[0]):
+            raise TypeError('%s cannot be batched: its return type '
+                            'is not a scalar'%name)
+        curs=self.pkg.curs
+        binds=[]
+        for i in range(len(values)):
+            size=sizes and sizes[i]
+            if not size:
+                binds.append(values[i])
+                continue
+            var=_bindvar(curs,size)
+            if not (func and i==0):
+                var.setvalue(0,values[i])
+            binds.append(var)
+        n=len(self.binds)
+        self.calls.append(self.bindre.sub(lambda m: ':%d'%(int(m.group(1))+n),
+                                          stmt[6:-5]))
+        self.binds.extend(binds)
+        result=BatchResult(func,n,len(binds))
+        self.results.append(result)
+        return result
+
+    def send(self):
+        \"\"\"send the recorded calls, and set their results\"\"\"
+        if not self.calls:
+            return
+        curs=self.pkg.curs
+        calls,binds,results=self.calls,self.binds,self.results
+        self.calls,self.binds,self.results=[],[],[]
+        if self.pkg.tagging:
+            self.pkg._tag(self.prefix[1:-2]+'.BATCH')
+        try:
+            curs.execute('begin %s end;'%' '.join(calls),binds)
+        except:
+            for result in results:
+                result.error=sys.exc_info()[1]
+            raise
+        values=[b.getvalue() for b in curs.bindvars]
+        for result in results:
+            result.values=values[result.start:result.start+result.n]
+        if self.pkg.autocommit:
+            curs.connection.commit()
+
+class _PooledBatch(Batch):
+    \"\"\"a Batch of a per call Pooled, holding a session until sent\"\"\"
+    def __init__(self,pooled):
+        self.pooled=pooled
+        Batch.__init__(self,pooled._take())
+
+    def __exit__(self,type,value,traceback):
+        if type is None:
+            self.send()
+        elif self.pkg is not None:
+            self._giveback(False)	# nothing was sent
+
+    def _record(self,name,stmt,sizes,args):
+        if self.pkg is None:
+            self.pkg=self.pooled._take()	# calls after a send()
+        return Batch._record(self,name,stmt,sizes,args)
+
+    def send(self):
+        \"\"\"send the recorded calls, and make the session idle again\"\"\"
+        if self.pkg is None:
+            return
+        try:
+            Batch.send(self)
+        except:
+            self._giveback(True)
+            raise
+        self._giveback(False)
+
+    def _giveback(self,failed):
+        w,self.pkg=self.pkg,None
+        self.pooled._giveback(w,failed)
+
+class BatchResult:
+    \"\"\"the future result of a call in a Batch\"\"\"
+    def __init__(self,func,start,n):
+        self.func=func
+        self.start=start	# first bind position in the block
+        self.n=n
+        self.values=None
+        self.error=None
+
+    def done(self):
+        return self.values is not None or self.error is not None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        if self.values is None:
+            raise ValueError('the batch has not been sent')
+        if self.func:
+            return self.values[0]
+        return self.values
+
+class Metrics:
+    \"\"\"
+    call counts, errors, rows, table elements and latency histograms of
+    the methods of generated classes
+
+        metrics=Metrics()
+        metrics.watch(Keyword)
+        ...
+        metrics.dump('/var/lib/node_exporter/orapig.prom','prometheus')
+        metrics.dump(log.info)
+
+    watch() wraps the methods of a class and unwatch() puts them back,
+    so a class that is not watched costs nothing.  rows are the rows
+    sent by _V methods and fetched by the REF CURSOR forms (an _iter's
+    as they are read), elements those of the lists passed to the other
+    methods for PL/SQL tables.  buckets are the histogram's upper
+    bounds, in seconds.
+    \"\"\"
+
+    buckets=(0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,
+             2.5,5,10)
+    clock=getattr(time,'perf_counter',time.time)
+
+    def __init__(self,buckets=None):
+        if buckets is not None:
+            self.buckets=tuple(sorted(buckets))
+        # (class, method) -> [calls, errors, rows, elements, seconds,
+        # calls per bucket..., calls over the last bucket]
+        self.stats={}
+        self._watched={}	# class -> its own methods before watch()
+        self._inside=threading.local()	# in a watched call, on a thread
+        self._lock=threading.Lock()
+
+    def watch(self,cls):
+        \"\"\"record the calls of the methods of a generated class\"\"\"
+        if cls in self._watched:
+            return
+        funcs=dict(cls.__dict__)
+        if hasattr(cls,'_docs'):
+            # --lazy: watch the methods not loaded yet too
+            __import__(cls._methods)
+            funcs.update(getattr(sys.modules[cls._methods],cls.__name__).__dict__)
+        saved={}
+        for name,func in funcs.items():
+            if name.startswith('_') or name=='batch' or \\
+                    not isinstance(func,types.FunctionType):
+                continue
+            saved[name]=cls.__dict__.get(name)
+            setattr(cls,name,self._wrap((cls.__name__,name),func))
+        self._watched[cls]=saved
+
+    def unwatch(self,cls):
+        \"\"\"stop recording the calls of a class\"\"\"
+        for name,func in self._watched.pop(cls,{}).items():
+            if func is None:
+                delattr(cls,name)
+            else:
+                setattr(cls,name,func)
+
+    def _wrap(self,key,func):
+        \"\"\"func, recording its calls under key\"\"\"
+        record=self._record
+        clock=self.clock
+        inside=self._inside
+        name=key[1]
+        many=name.endswith('_V')
+        fetch=name.endswith(('_L','_columns'))
+        stream=name.endswith('_iter')
+        def method(self,*args,**kw):
+            if getattr(inside,'call',False):
+                # _chunks and _calleach call the public methods again
+                return func(self,*args,**kw)
+            rows=elements=0
+            if many:
+                if args:
+                    parmlist=_Counter(args[0])
+                    args=(parmlist,)+args[1:]
+                else:
+                    parmlist=kw['parmlist']=_Counter(kw['parmlist'])
+            elif not (fetch or stream):
+                for arg in args:
+                    if isinstance(arg,(list,tuple)):
+                        elements+=len(arg)
+            start=clock()
+            inside.call=True
+            try:
+                rv=func(self,*args,**kw)
+            except:
+                inside.call=False
+                record(key,clock()-start,1,0,elements)
+                raise
+            inside.call=False
+            if many:
+                rows=parmlist.n
+            elif fetch and rv:
+                if isinstance(rv,dict):
+                    rows=len(list(rv.values())[0])
+                else:
+                    rows=len(rv)
+            record(key,clock()-start,0,rows,elements)
+            if stream:
+                return _countrows(record,key,rv)
+            return rv
+        method.__name__=func.__name__
+        method.__doc__=func.__doc__
+        return method
+
+    def _record(self,key,seconds,errors,rows,elements):
+        self._lock.acquire()
+        try:
+            stat=self.stats.get(key)
+            if stat is None:
+                stat=self.stats[key]=[0]*(6+len(self.buckets))
+            if seconds is not None:
+                stat[0]+=1
+                stat[4]+=seconds
+                stat[5+bisect.bisect_left(self.buckets,seconds)]+=1
+            stat[1]+=errors
+            stat[2]+=rows
+            stat[3]+=elements
+        finally:
+            self._lock.release()
+
+    def reset(self):
+        \"\"\"forget the calls recorded so far\"\"\"
+        self._lock.acquire()
+        self.stats={}
+        self._lock.release()
+
+    def snapshot(self):
+        \"\"\"the statistics, as {'Class.method': {...}}, the buckets as
+        cumulative [upper bound, calls] pairs\"\"\"
+        self._lock.acquire()
+        try:
+            stats=[(key,list(stat)) for key,stat in self.stats.items()]
+        finally:
+            self._lock.release()
+        rv={}
+        for key,stat in stats:
+            buckets=[]
+            n=0
+            for le,calls in zip(self.buckets+('+Inf',),stat[5:]):
+                n+=calls
+                buckets.append([le,n])
+            rv['%s.%s'%key]={'calls':stat[0],'errors':stat[1],
+                             'rows':stat[2],'elements':stat[3],
+                             'seconds':stat[4],'buckets':buckets}
+        return rv
+
+    def json(self):
+        \"\"\"the snapshot as JSON\"\"\"
+        return json.dumps(self.snapshot(),sort_keys=True)
+
+    def prometheus(self):
+        \"\"\"the snapshot in the Prometheus text format\"\"\"
+        stats=sorted(self.snapshot().items())
+        lines=[]
+        for metric,field,text in (
+              ('calls_total','calls','calls of generated methods'),
+              ('errors_total','errors','calls that raised an exception'),
+              ('rows_total','rows','rows sent or fetched'),
+              ('elements_total','elements','PL/SQL table elements bound')):
+            lines.append('# HELP orapig_%s %s'%(metric,text))
+            lines.append('# TYPE orapig_%s counter'%metric)
+            for name,stat in stats:
+                labels='class="%s",method="%s"'%tuple(name.split('.'))
+                lines.append('orapig_%s{%s} %d'%(metric,labels,stat[field]))
+        lines.append('# HELP orapig_call_seconds call latency')
+        lines.append('# TYPE orapig_call_seconds histogram')
+        for name,stat in stats:
+            labels='class="%s",method="%s"'%tuple(name.split('.'))
+            for le,n in stat['buckets']:
+                lines.append('orapig_call_seconds_bucket{%s,le="%s"} %d'%
+                             (labels,le,n))
+            lines.append('orapig_call_seconds_sum{%s} %r'%
+                         (labels,stat['seconds']))
+            lines.append('orapig_call_seconds_count{%s} %d'%
+                         (labels,stat['calls']))
+        return '\\n'.join(lines)+'\\n'
+
+    def dump(self,target,format='json'):
+        \"\"\"write the snapshot, as 'json' or 'prometheus' text, to a file
+        (replaced in one step, for collectors reading it) or pass it to
+        a callable\"\"\"
+        if format=='prometheus':
+            text=self.prometheus()
+        else:
+            text=self.json()
+        if callable(target):
+            target(text)
+            return
+        f=open(target+'.tmp','w')
+        f.write(text)
+        f.close()
+        if os.path.exists(target) and sys.platform=='win32':
+            os.remove(target)
+        os.rename(target+'.tmp',target)
+
+def _number(value):
+    \"\"\"a NUMBER read through a decimal.Decimal variable: an int when it
+    is whole, so that integers keep every digit, else a float\"\"\"
+    if value==value.to_integral_value():
+        return int(value)
+    return float(value)
+
+def _bindvar(curs,size):
+    \"\"\"a bind variable for one position of a _T sizes tuple\"\"\"
+    if isinstance(size,int):
+        return curs.var(cx_Oracle.STRING,size)
+    elif size is decimal.Decimal:
+        return curs.var(size,outconverter=_number)
+    return curs.var(size)
+
+def _countrows(record,key,rows):
+    \"\"\"the rows of an _iter method, recorded once they are read\"\"\"
+    n=0
+    try:
+        for row in rows:
+            n+=1
+            yield row
+    finally:
+        record(key,None,0,n,0)
+
+class _Counter:
+    \"\"\"an iterator over rows, counting them\"\"\"
+    def __init__(self,rows):
+        self.rows=iter(rows)
+        self.n=0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row=next(self.rows)
+        self.n+=1
+        return row
+    next=__next__
+
+class Package:
+    \"\"\"
+    base of the generated classes: their settings, and the helpers
+    their methods call
+    \"\"\"
+
+    # whether calls set the session's module (tagmodule, or the
+    # package), action (PACKAGE.SUBPROGRAM) and client identifier
+    # (clientid, if set); False leaves them alone
+    tagging=False
+    tagmodule=None
+    clientid=None
+
+    #------------------------------------------------------
+    def __init__(self,curs):
+        self.curs=curs
+        # do not set autocommit if your are not
+        # writing an appserver!
+        self.autocommit=False
+        # rows sent per round trip by the _V procedures
+        self.batchsize=1000
+        # longest OUT string a _V procedure returns per row; each OUT
+        # string parameter buffers batchsize times this many bytes
+        self.maxoutstring=4000
+        # rows per fetch, and rows prefetched (None: arraysize+1),
+        # for the _iter and _L forms of REF CURSOR subprograms
+        self.arraysize=1000
+        self.prefetch=None
+        # LOBs returned or fetched up to this long (bytes or characters)
+        # come back as their content, longer ones as LobReaders; None
+        # leaves them as LOB locators
+        self.lobinline=65536
+        # elements per call of a PL/SQL table parameter; a procedure
+        # given a longer IN table is called once per maxarray elements
+        self.maxarray=32767
+        self._vars={}
+        self._arrays={}
+        # what the cached results are kept apart by
+        self._db=(curs.connection.dsn,curs.connection.username)
+
+    #------------------------------------------------------
+    def batch(self):
+        \"\"\"calls on the returned Batch are sent in one round trip\"\"\"
+        return Batch(self)
+
+    #------------------------------------------------------
+    def _newvars(self,name,sizes):
+        \"\"\"make the bind variables of a method, on its first call\"\"\"
+        vars=[]
+        for size in sizes:
+            if size is None:
+                vars.append(None)
+            else:
+                vars.append(_bindvar(self.curs,size))
+        self._vars[name]=vars
+        return vars
+
+    #------------------------------------------------------
+    def _tag(self,action):
+        \"\"\"tag the session with the call about to be made, for V$SESSION,
+        V$SQL and ASH; cx_Oracle sends the tags with that call\"\"\"
+        conn=self.curs.connection
+        conn.module=self.tagmodule or action.split('.')[0]
+        conn.action=action
+        if self.clientid is not None:
+            conn.client_identifier=self.clientid
+
+    #------------------------------------------------------
+    def _arrayvar(self,key,type,values,width=None):
+        \"\"\"a PL/SQL table variable holding values (or, for an int,
+        that many empty elements), kept under key for the next call.
+        It is only reallocated when it is too small, then to the next
+        power of two elements (and characters, for strings of an IN
+        table; those of an OUT or IN OUT table are width long).\"\"\"
+        if isinstance(values,int):
+            n,values=values,[]
+        else:
+            n=len(values)
+        if width is None and type in (cx_Oracle.STRING,cx_Oracle.FIXED_CHAR):
+            width=max([len(v) for v in values if v is not None]+[1])
+            fixed=False
+        else:
+            width=width or 0
+            fixed=True
+        var,size,size2=self._arrays.get(key,(None,0,0))
+        if n>size or width>size2:
+            size=max(size,16)
+            while size<n:
+                size*=2
+            if fixed:
+                size2=width
+            while size2<width:
+                size2=max(size2*2,16)
+            if size2:
+                var=self.curs.arrayvar(type,size,size2)
+            else:
+                var=self.curs.arrayvar(type,size)
+            self._arrays[key]=(var,size,size2)
+        var.setvalue(0,values)
+        return var
+
+    #------------------------------------------------------
+    def _chunks(self,method,args,i):
+        \"\"\"call method once per maxarray elements of its IN table
+        args[i], committing once at the end if autocommit is set\"\"\"
+        values=args[i]
+        autocommit,self.autocommit=self.autocommit,False
+        try:
+            for start in range(0,len(values),self.maxarray):
+                args[i]=values[start:start+self.maxarray]
+                result=method(*args)
+        finally:
+            self.autocommit=autocommit
+        if autocommit:
+            self.curs.connection.commit()
+        result[i]=values
+        return result
+
+    #------------------------------------------------------
+    def _refcursor(self,arraysize):
+        \"\"\"a cursor to receive a REF CURSOR, set up for bulk fetches\"\"\"
+        rc=self.curs.connection.cursor()
+        rc.arraysize=arraysize or self.arraysize
+        if hasattr(rc,'prefetchrows'):
+            rc.prefetchrows=self.prefetch or rc.arraysize+1
+        if self.lobinline is not None:
+            rc.outputtypehandler=self._lobhandler
+        return rc
+
+    #------------------------------------------------------
+    def _lobhandler(self,cursor,name,type,size,precision,scale):
+        \"\"\"fetch LOB columns through _lob\"\"\"
+        if type in (cx_Oracle.CLOB,cx_Oracle.NCLOB,cx_Oracle.BLOB):
+            return cursor.var(type,arraysize=cursor.arraysize,
+                              outconverter=self._lob)
+
+    #------------------------------------------------------
+    def _lob(self,value):
+        \"\"\"a LOB's content if it is at most lobinline long, else a
+        LobReader; either way the first read is the only round trip\"\"\"
+        if self.lobinline is None or not hasattr(value,'getchunksize'):
+            return value
+        data=value.read(1,self.lobinline+1)
+        if len(data)<=self.lobinline:
+            return data
+        return LobReader(value,data)
+
+    #------------------------------------------------------
+    def _lobin(self,value,type):
+        \"\"\"a LOB parameter: a file-like value is copied into a
+        temporary LOB, LobReader.chunks LOB chunks per round trip\"\"\"
+        if not hasattr(value,'read'):
+            return value
+        lob=self.curs.connection.createlob(type)
+        size=lob.getchunksize()*LobReader.chunks
+        offset=1
+        while True:
+            data=value.read(size)
+            if not data:
+                break
+            lob.write(data,offset)
+            offset+=len(data)
+        return lob
+
+    #------------------------------------------------------
+    def _rows(self,rc):
+        \"\"\"iterate over the rows of a cursor, arraysize rows per fetch\"\"\"
+        try:
+            while 1:
+                rows=rc.fetchmany()
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            rc.close()
+
+    #------------------------------------------------------
+    def _fetchall(self,rc):
+        \"\"\"all the rows of a cursor, which is then closed\"\"\"
+        try:
+            return rc.fetchall()
+        finally:
+            rc.close()
+
+    #------------------------------------------------------
+    def _columns(self,rc):
+        \"\"\"fetch all the rows of a cursor into one array per column,
+        keyed by lower case column name.  NUMBER columns become numpy
+        int64 or float64 arrays (None is nan), DATE and TIMESTAMP
+        columns datetime64 arrays; without numpy, NUMBER columns are
+        array.array('d') and the rest lists.\"\"\"
+        try:
+            import numpy
+        except ImportError:
+            numpy=None
+        try:
+            rows=rc.fetchmany()
+            desc=rc.description
+            kinds=[]
+            for d in desc:
+                if d[1]==cx_Oracle.NUMBER:
+                    kinds.append(numpy and d[5]==0 and 0<(d[4] or 99)<=18
+                                 and 'i' or 'd')
+                elif numpy and d[1] in (cx_Oracle.DATETIME,cx_Oracle.TIMESTAMP):
+                    kinds.append('t')
+                else:
+                    kinds.append(None)
+            chunks=[[] for d in desc]
+            while rows:
+                cols=list(zip(*rows))
+                rows=None	# let the row tuples go
+                for i in range(len(desc)):
+                    chunks[i].append(self._column(numpy,kinds[i],cols[i]))
+                rows=rc.fetchmany()
+        finally:
+            rc.close()
+        result={}
+        for i in range(len(desc)):
+            if kinds[i] is None:
+                col=[]
+                for c in chunks[i]:
+                    col.extend(c)
+            elif numpy and chunks[i]:
+                col=numpy.concatenate(chunks[i])
+            elif numpy:
+                col=self._column(numpy,kinds[i],())
+            else:
+                col=array.array('d')
+                for c in chunks[i]:
+                    col.extend(c)
+            result[desc[i][0].lower()]=col
+        return result
+
+    #------------------------------------------------------
+    def _column(self,numpy,kind,values):
+        \"\"\"convert a batch of one column's values\"\"\"
+        nan=float('nan')
+        if kind is None:
+            return values
+        elif kind=='t':
+            return numpy.array(values,'datetime64[us]')
+        elif numpy:
+            try:
+                return numpy.array(values,kind=='i' and 'i8' or 'f8')
+            except TypeError:
+                return numpy.array([v is None and nan or v for v in values],'f8')
+        try:
+            return array.array('d',values)
+        except TypeError:
+            return array.array('d',[v is None and nan or v for v in values])
+
+    #------------------------------------------------------
+    def _executemany(self,stmt,sizes,rows,batchsize,batcherrors,arrays,outs):
+        \"\"\"execute stmt for each row, batchsize rows at a time\"\"\"
+        rows=iter(rows)
+        batchsize=batchsize or self.batchsize
+        if sizes:
+            # IN strings are sized by the driver from the data, OUT
+            # strings at most maxoutstring per row of the batch
+            sizes=[(i in outs or not isinstance(sizes[i],int)) and sizes[i]
+                   or None for i in range(len(sizes))]
+            sizes=[isinstance(s,int) and min(s,self.maxoutstring) or s
+                   for s in sizes]
+        results=[]
+        errors=[]
+        offset=0
+        while 1:
+            chunk=[list(row) for row in itertools.islice(rows,batchsize)]
+            if not chunk:
+                break
+            for j in range(len(chunk)):
+                for i in arrays:
+                    chunk[j][i]=self._arrayvar((stmt,i,j),arrays[i],
+                                               chunk[j][i])
+            start=0
+            while start<len(chunk):
+                if sizes:
+                    self.curs.setinputsizes(*sizes)
+                try:
+                    self.curs.executemany(stmt,chunk[start:])
+                    failed=len(chunk)
+                except cx_Oracle.DatabaseError:
+                    if not batcherrors:
+                        raise
+                    # rowcount is the number of rows run before the error
+                    failed=start+max(self.curs.rowcount,0)
+                    errors.append((offset+failed,sys.exc_info()[1]))
+                if outs:
+                    vars=self.curs.bindvars
+                    for j in range(failed-start):
+                        row=chunk[start+j]
+                        for i in outs:
+                            row[i]=vars[i].getvalue(j)
+                            if sizes[i] is decimal.Decimal and \
+                               row[i] is not None:
+                                row[i]=_number(row[i])
+                        results.append(row)
+                    if failed<len(chunk):
+                        results.append(None)
+                start=failed+1
+            offset+=len(chunk)
+        if outs and batcherrors:
+            return results,errors
+        elif outs:
+            return results
+        elif batcherrors:
+            return errors
+
+    #------------------------------------------------------
+    def _calleach(self,call,rows,batcherrors):
+        \"\"\"call for each row, one round trip per row\"\"\"
+        results=[]
+        errors=[]
+        for row in rows:
+            try:
+                results.append(call(*row))
+            except cx_Oracle.DatabaseError:
+                if not batcherrors:
+                    raise
+                errors.append((len(results),sys.exc_info()[1]))
+                results.append(None)
+        if batcherrors:
+            return results,errors
+        return results
 """
 pytmpl[file1] = ""
+pytmpl[afile0] = """\
+import asyncio
+import concurrent.futures
+
+class _AsyncPackage:
+    \"\"\"base of the asyncio classes: runs the methods of a generated
+    class in a bounded pool of threads, each holding one session from
+    a cx_Oracle session pool.  Sessions are in autocommit mode, so
+    every call is its own transaction.\"\"\"
+
+    wrapper=None	# the generated class
+
+    def __init__(self,pool,workers=4):
+        self.pooled=Pooled(self.wrapper,pool,perthread=True,autocommit=True)
+        self.batchsize=1000
+        self.arraysize=1000
+        self.executor=concurrent.futures.ThreadPoolExecutor(workers)
+
+    def close(self):
+        \"\"\"wait for running calls, then give the sessions back\"\"\"
+        self.executor.shutdown()
+        self.pooled.close()
+
+    async def _run(self,name,*args,**kw):
+        loop=asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor,self.pooled._call,
+                                          name,args,kw)
+
+    async def _many(self,name,rows,batchsize,batcherrors,outs):
+        \"\"\"a _V call, one executor job per batch\"\"\"
+        results=[]
+        errors=[]
+        offset=0
+        async for chunk in _chunks(rows,batchsize or self.batchsize):
+            rv=await self._run(name,chunk,len(chunk),batcherrors)
+            errs=[]
+            if outs and batcherrors:
+                rv,errs=rv
+            elif batcherrors:
+                errs=rv
+            if outs:
+                results.extend(rv)
+            errors.extend([(offset+i,e) for i,e in errs])
+            offset+=len(chunk)
+        if outs and batcherrors:
+            return results,errors
+        elif outs:
+            return results
+        elif batcherrors:
+            return errors
+
+    async def _stream(self,name,args,arraysize):
+        \"\"\"an _iter call, one executor job per fetch\"\"\"
+        arraysize=arraysize or self.arraysize
+        rows=await self._run(name,*args,arraysize=arraysize)
+        loop=asyncio.get_event_loop()
+        while True:
+            batch=await loop.run_in_executor(self.executor,_take,
+                                             rows,arraysize)
+            if not batch:
+                break
+            for row in batch:
+                yield row
+
+async def _chunks(rows,n):
+    \"\"\"lists of up to n rows from an iterable or an async iterable\"\"\"
+    chunk=[]
+    if hasattr(rows,'__aiter__'):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk)==n:
+                yield chunk
+                chunk=[]
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk)==n:
+                yield chunk
+                chunk=[]
+    if chunk:
+        yield chunk
+
+def _take(rows,n):
+    \"\"\"the next n rows of an iterator\"\"\"
+    return list(itertools.islice(rows,n))
+"""
+pytmpl[aclass0]="""\
+
+class %sAsync(_AsyncPackage):
+    \"\"\"
+    asyncio interface for package %s, with the methods of %s
+
+    %sAsync(pool,workers=4) runs calls in up to workers threads,
+    each with a session from the cx_Oracle session pool; calls are
+    committed as they complete.
+    \"\"\"
+
+    wrapper=%s
+"""
+pytmpl[acall0]="""\
+    #------------------------------------------------------
+    async def %s(self%s):
+        \"\"\"
+%s
+        \"\"\"
+        return await self._run('%s'%s)
+"""
+pytmpl[amany0]="""\
+    #------------------------------------------------------
+    async def %s(self%s,parmlist,batchsize=None,batcherrors=False):
+        \"\"\"
+%s
+        (parmlist may also be an async iterable)
+        \"\"\"
+        return await self._many('%s',parmlist,batchsize,batcherrors,%s)
+"""
+pytmpl[astream0]="""\
+    #------------------------------------------------------
+    def %s(self%s,arraysize=None):
+        \"\"\"
+%s
+        (an async generator)
+        \"\"\"
+        return self._stream('%s',[%s],arraysize)
+"""
+pytmpl[stmt0] = """\
+%s = %s
+"""
+pytmpl[rt0] = """\
+#-----------------------------------------------------------------------
+#  the call engine: methods built from the tables of --runtime modules
+#-----------------------------------------------------------------------
+
+def _args(name,parms,args,kw):
+    \"\"\"the argument values of a call, in parameter order\"\"\"
+    if kw:
+        try:
+            args=tuple(args)+tuple([kw.pop(p) for p in parms[len(args):]])
+        except KeyError:
+            raise TypeError('%s() missing argument %s'%(name,sys.exc_info()[1]))
+        if kw:
+            raise TypeError('%s() got unexpected arguments: %s'%
+                            (name,', '.join(kw)))
+    if len(args)!=len(parms):
+        raise TypeError('%s() takes %d arguments (%d given)'%
+                        (name,len(parms),len(args)))
+    return args
+
+def _binder(name,sizes,skip=None):
+    \"\"\"a function making the bind list of a call from its values; typed
+    positions go through the method's cached variables, except position
+    skip (a function's result)\"\"\"
+    if sizes is None:
+        return lambda self,values: values
+    typed=[i for i in range(len(sizes)) if sizes[i] and i!=skip]
+    untyped=[i for i in range(len(sizes)) if not sizes[i]]
+    def bind(self,values):
+        _v=self._vars.get(name)
+        if _v is None:
+            _v=self._newvars(name,sizes)
+        for i in typed:
+            _v[i].setvalue(0,values[i])
+        if not untyped:
+            return _v
+        binds=list(_v)
+        for i in untyped:
+            binds[i]=values[i]
+        return binds
+    return bind
+
+def _proc(name,action,stmt,sizes,parms,arrays,lobins,lobouts,chunk):
+    n=len(parms)
+    bind=_binder(name,sizes)
+    def method(self,*args,**kw):
+        if kw or len(args)!=n:
+            args=_args(name,parms,args,kw)
+        if chunk is not None and self.maxarray and \\
+                len(args[chunk])>self.maxarray:
+            return self._chunks(getattr(self,name),list(args),chunk)
+        if arrays or lobins:
+            args=list(args)
+            for i,t,key,width in arrays:
+                args[i]=self._arrayvar(key,t,args[i],width)
+            for i,t in lobins:
+                args[i]=self._lobin(args[i],t)
+        if self.tagging:
+            self._tag(action)
+        self.curs.execute(stmt,bind(self,args))
+        result=[_b.getvalue() for _b in self.curs.bindvars]
+        for i in lobouts:
+            result[i]=self._lob(result[i])
+        if self.autocommit:
+            self.curs.connection.commit()
+        return result
+    return method
+
+def _procv(name,action,stmt,sizes,arrays,outs,eachrow):
+    arrays=dict([(i,t) for i,t,key,width in arrays])
+    def method(self,parmlist,batchsize=None,batcherrors=False):
+        if self.tagging:
+            self._tag(action)
+        if eachrow:
+            result=self._calleach(getattr(self,name),parmlist,batcherrors)
+        else:
+            result=self._executemany(stmt,sizes,parmlist,batchsize,
+                                     batcherrors,arrays,outs)
+        if self.autocommit:
+            self.curs.connection.commit()
+        return result
+    return method
+
+def _func(name,action,stmt,sizes,parms,arrays,lobins,rettype,cached):
+    n=len(parms)
+    typed=sizes is not None and sizes[0] is not None
+    lob=rettype in (cx_Oracle.CLOB,cx_Oracle.BLOB)
+    bind=_binder(name,sizes,0)
+    def method(self,*args,**kw):
+        if kw or len(args)!=n:
+            args=_args(name,parms,args,kw)
+        if cached:
+            _c=self.caches[name]
+            rv=_c.get((self._db,)+args,_c)
+            if rv is not _c:
+                return rv
+        values=args
+        if lobins:
+            values=list(args)
+            for i,t in lobins:
+                values[i]=self._lobin(values[i],t)
+            values=tuple(values)
+        if typed:
+            binds=bind(self,(None,)+values)
+            rv=binds[0]
+        else:
+            rv=self.curs.var(rettype)
+            binds=bind(self,(rv,)+values)
+        if arrays:
+            binds=list(binds)
+            for i,t,key,width in arrays:
+                binds[i+1]=self._arrayvar(key,t,binds[i+1],width)
+        if self.tagging:
+            self._tag(action)
+        self.curs.execute(stmt,binds)
+        rv=rv.getvalue()
+        if lob:
+            rv=self._lob(rv)
+        if cached:
+            _c.put((self._db,)+args,rv)
+        if self.autocommit:
+            self.curs.connection.commit()
+        return rv
+    return method
+
+def _unsupported(name,parms,rettype):
+    def method(self,*args,**kw):
+        _args(name,parms,args,kw)
+        raise TypeError("Unsupported Oracle Data Type: %s"%rettype)
+    return method
+
+def _cursor(name,action,stmt,sizes,parms,arrays,lobins,cursor,func,fetch):
+    # a procedure's cursor is one of its parameters, a function's is
+    # its result, ahead of them
+    if not func:
+        parms=parms[:cursor]+parms[cursor+1:]
+    offset=func and 1 or 0
+    bind=_binder(name,sizes)
+    def method(self,*args,**kw):
+        arraysize=kw.pop('arraysize',None)
+        if len(args)==len(parms)+1:
+            args,arraysize=args[:-1],args[-1]
+        values=list(_args(name,parms,args,kw))
+        rv=self._refcursor(arraysize)
+        values.insert(cursor,rv)
+        for i,t,key,width in arrays:
+            values[i+offset]=self._arrayvar(key,t,values[i+offset],width)
+        for i,t in lobins:
+            values[i+offset]=self._lobin(values[i+offset],t)
+        if self.tagging:
+            self._tag(action)
+        self.curs.execute(stmt,bind(self,values))
+        if self.autocommit:
+            self.curs.connection.commit()
+        return getattr(self,fetch)(rv)
+    return method
+
+def methods(cls,table):
+    \"\"\"give a --runtime class the methods its table describes
+
+    Each row is (name, kind, statement, bind sizes, parameters,
+    parameter modes, array element types by parameter index, LOB types
+    by parameter index, return type, REF CURSOR position, cached, doc).
+    The element type of an OUT or IN OUT table of strings is a (type,
+    element length) pair.
+    \"\"\"
+    statements={}
+    def add(name,method,doc):
+        method.__name__=name
+        method.__doc__='\\n%s\\n        '%doc
+        setattr(cls,name,method)
+    for name,kind,stmt,sizes,parms,modes,arrays,lobs,rettype,cursor,cached,\\
+            doc in table:
+        # PL/SQL table variables are kept under the same keys as in
+        # the generated modules
+        tables=[]
+        for i,t in sorted(arrays.items()):
+            width=None
+            if isinstance(t,tuple):
+                t,width=t
+            tables.append((i,t,'%s.%s'%(name,parms[i]),width))
+        arrays=tables
+        lobins=[(i,t) for i,t in sorted(lobs.items()) if modes[i]!='OUT']
+        lobouts=[i for i in sorted(lobs) if modes[i]!='IN']
+        action='%s.%s'%(cls.__name__.upper(),name.upper())
+        if kind=='proc':
+            # a procedure whose only table is IN can be called in chunks
+            chunk=None
+            if len(arrays)==1 and not lobs and modes[arrays[0][0]]=='IN':
+                chunk=arrays[0][0]
+            statements[name]=(stmt,sizes)
+            add(name,_proc(name,action,stmt,sizes,parms,arrays,lobins,
+                           lobouts,chunk),doc)
+            outs=tuple([i for i in range(len(modes))
+                        if sizes and sizes[i] and modes[i]!='IN'])
+            # tables, and OUT types with no bind size, go a row at a time
+            eachrow=[i for i in range(len(modes))
+                     if not (sizes and sizes[i]) and modes[i]!='IN']
+            vdoc=doc+'\\n        (this is the autogenerated vectorized _V procedure)'
+            vdoc+='\\n        (parmlist may be any iterable, sent batchsize rows at a time)'
+            vdoc+='\\n        (batcherrors returns failed rows as (index, error) pairs)'
+            if outs or eachrow:
+                vdoc+='\\n        (returns the parameter list of each row, with OUT values)'
+            if eachrow:
+                vdoc+='\\n        (OUT parameters that cannot be array bound: one round trip per row)'
+            add(name+'_V',
+                _procv(name,action,stmt,sizes,arrays,outs,eachrow),vdoc)
+        elif kind=='func':
+            statements[name]=(stmt,sizes)
+            add(name,_func(name,action,stmt,sizes,parms,arrays,lobins,
+                           rettype,cached),doc)
+        else:
+            add(name,_unsupported(name,parms,rettype),doc)
+        if cursor is None:
+            continue
+        for suffix,fdoc,fetch in (
+              ('_iter','_iter version, streams arraysize rows per fetch',
+               '_rows'),
+              ('_L','list-consing _L version','_fetchall'),
+              ('_columns','_columns version, returns {column: array}',
+               '_columns')):
+            add(name+suffix,
+                _cursor(name,action,stmt,sizes,parms,arrays,lobins,cursor,
+                        kind=='func',fetch),
+                doc+'\\n        (autogenerated %s)'%fdoc)
+    cls._statements=statements
+"""
+pytmpl[rfile0] = """\
+import decimal
+import cx_Oracle
+from orapig_runtime import Package, Pooled, Batch, ResultCache, LobReader, \\
+     Metrics, methods
+"""
+pytmpl[rclass0]="""\
+
+class %s(Package):
+    \"\"\"
+%s    \"\"\"
+
+    # results of the cached functions, shared by all instances
+    caches={%s}
+
+methods(%s,(
+"""
+pytmpl[lfile0] = """\
+import importlib
+
+def _loadmethod(cls,name):
+    \"\"\"copy a method of a --lazy class in from its methods module\"\"\"
+    if name.startswith('__'):
+        raise AttributeError(name)
+    methods=getattr(importlib.import_module(cls._methods),cls.__name__)
+    func=methods.__dict__.get(name)
+    if func is None:
+        raise AttributeError(name)
+    setattr(cls,name,func)
+    return func
+
+def loaddocs(cls):
+    \"\"\"load all the methods of a --lazy class, with their doc strings,
+    for help() and pydoc\"\"\"
+    methods=getattr(importlib.import_module(cls._methods),cls.__name__)
+    docs=importlib.import_module(cls._docs).docs
+    for name,func in methods.__dict__.items():
+        if isinstance(func,types.FunctionType):
+            func.__doc__=docs.get(name)
+            setattr(cls,name,func)
+"""
+pytmpl[lazy0]="""\
+    # where the methods and their doc strings are, see loaddocs()
+    _methods='%s'
+    _docs='%s'
+
+    #------------------------------------------------------
+    def __getattr__(self,name):
+        \"\"\"load a method on first use\"\"\"
+        return _loadmethod(self.__class__,name).__get__(self,self.__class__)
+"""
+pytmpl[lmod0]="""\
+import decimal
+import cx_Oracle
+
+"""
+pytmpl[lclass0]="""\
+class %s:
+    \"\"\"the methods of %s.%s, copied in as they are used\"\"\"
+"""
 
 #-----------------------------------------------------------------------
 # PyTrans
@@ -346,29 +2564,223 @@ class PyTrans(Trans):
         'CURSOR'		:'CURSOR'
     }
 
-    def __init__(self,conn,output):
-        Trans.__init__(self,conn,output)
+    # the cx_Oracle.setinputsizes arguments for the types that are
+    # bound through preallocated variables, strings by length; numbers
+    # go through decimal.Decimal so that they come back exact
+    sizemap={
+        'NUMBER'		:'decimal.Decimal',
+        'FLOAT'			:'decimal.Decimal',
+        'DATE'			:'cx_Oracle.DATETIME',
+        'TIMESTAMP'		:'cx_Oracle.TIMESTAMP',
+        'VARCHAR2'		:'%d',
+        'CHAR'			:'%d',
+    }
+    maxstring=32767	# longest PL/SQL string
+    resultttl=60	# seconds a RESULT_CACHE function's results are kept
+
+    # the types returned through _lob, and taking file-like values
+    lobtypes=('BLOB','CLOB')
+
+    def __init__(self,conn,output,stats=None,asyncclasses=False,
+                 runtime=False):
+        Trans.__init__(self,conn,output,stats)
+        self.asyncclasses=asyncclasses	# also emit asyncio classes
+        self.runtime=runtime	# emit tables for orapig_runtime.py
+        self.methods=[]		# (template, name, parms, comment, extra)
 
-    def getpyfunctype(self,owner,objname):
+    def getsizes(self,owner,objname,package_name):
+        """get the input size of each bind position of a call, from the
+        dictionary types; None where the value is bound as passed.
+        A function's return value is the first position."""
+        rows=[row for row in self.getargs(owner,objname,package_name)
+              if row[aName] is not None]
+        rows.sort(lambda a,b: cmp(a[aPosition],b[aPosition]))
+        if self.isfunc(owner,objname,package_name):
+            rows.insert(0,[row for row in self.getargs(owner,objname,package_name)
+                           if row[aName] is None and row[aPosition]==0][0])
+        rv=[]
+        for row in rows:
+            size=self.sizemap.get(row[aType])
+            if size and '%' in size:
+                size=size%(row[aLength] or self.maxstring)
+            rv.append(size)
+        return rv
+
+    def getarraywidths(self,owner,objname,package_name):
+        """get the element length of each OUT or IN OUT table of strings,
+        by parameter; IN tables are sized from the values passed"""
+        rv={}
+        parm=None
+        for row in self.getargs(owner,objname,package_name):
+            if row[aType]=="PL/SQL TABLE" and row[aName] is not None:
+                parm=row
+            elif row[aName] is None and parm is not None:
+                if parm[aInOut]!='IN' and row[aType] in ('VARCHAR2','CHAR'):
+                    rv[parm[aName].lower()]=row[aLength] or self.maxstring
+                parm=None
+        return rv
+
+    def dobinds(self,owner,objname,package_name,values):
+        """generate the code binding values (one expression per bind
+        position) through the method's cached variables
+
+        Returns the code and the bind list expression, or None for
+        both if nothing in the call has a known input size.
+        """
+        sizes=self.getsizes(owner,objname,package_name)
+        if not [s for s in sizes if s]:
+            return None,None
+        name=objname.lower()
+        code ="        _v=self._vars.get('%s')\n"%name
+        code+="        if _v is None:\n"
+        code+="            _v=self._newvars('%s',%s_T)\n"%(name,self.stmtname(objname))
+        binds=[]
+        for i in range(len(sizes)):
+            if not sizes[i]:
+                binds.append(values[i])
+            else:
+                binds.append('_v[%d]'%i)
+                if values[i] is not None:
+                    code+="        _v[%d].setvalue(0,%s)\n"%(i,values[i])
+        if None in sizes:
+            return code,'['+','.join(binds)+']'
+        return code,'_v'
+
+    def getlobparms(self,owner,objname,package_name):
+        """get the LOB parameters of a subprogram, as (index, cx_Oracle
+        type, mode) triples"""
+        types=self.getparmtypes(owner,objname,package_name)
+        modes=self.getparmmodes(owner,objname,package_name)
+        return [(i,'cx_Oracle.'+self.typemap[types[i]],modes[i])
+                for i in range(len(types)) if types[i] in self.lobtypes]
+
+    def doarrays(self,owner,objname,package_name):
+        """the code binding PL/SQL table parameters through _arrayvar,
+        which reuses their variables from call to call"""
+        arraytype=self.getarrayparms(owner,objname,package_name)
+        widths=self.getarraywidths(owner,objname,package_name)
+        code=''
+        for parm in self.getparms(owner,objname,package_name):
+            if arraytype.has_key(parm):
+                width=''
+                if widths.has_key(parm):
+                    width=',%d'%widths[parm]
+                code+="        %s=self._arrayvar('%s.%s',cx_Oracle.%s,%s%s)\n"%\
+                      (parm,objname.lower(),parm,
+                       self.typemap[arraytype[parm]],parm,width)
+        return code
+
+    def dochunks(self,owner,procname,package_name):
+        """the code calling a procedure once per maxarray elements of
+        its IN table, if that is its only table and it has no LOBs"""
+        arraytype=self.getarrayparms(owner,procname,package_name)
+        if len(arraytype)!=1 or self.getlobparms(owner,procname,package_name):
+            return ''
+        parms=self.getparms(owner,procname,package_name)
+        i=parms.index(arraytype.keys()[0])
+        if self.getparmmodes(owner,procname,package_name)[i]!='IN':
+            return ''
+        code ="        if self.maxarray and len(%s)>self.maxarray:\n"%parms[i]
+        code+="            return self._chunks(self.%s,[%s],%d)\n"%\
+              (procname.lower(),','.join(parms),i)
+        return code
+
+    def dolobins(self,owner,objname,package_name):
+        """the code passing file-like values of LOB IN parameters
+        through _lobin"""
+        parms=self.getparms(owner,objname,package_name)
+        code=''
+        for i,t,mode in self.getlobparms(owner,objname,package_name):
+            if mode!='OUT':
+                code+="        %s=self._lobin(%s,%s)\n"%(parms[i],parms[i],t)
+        return code
+
+    def getpyfunctype(self,owner,objname,package_name):
         """get the python (cx_Oracle) data type of a parm or rc"""
-        dt=self.getfunctype(owner,objname)
+        dt=self.getfunctype(owner,objname,package_name)
         if self.typemap.has_key(dt):
             return (dt, 'cx_Oracle.'+self.typemap[dt])
         else:
             return (dt,None)
 
-    def dofile(self,package_names):
-        """process a file"""
+    def dofile0(self):
+        """the start of a module"""
+        if self.runtime:
+            self.println(pytmpl[rfile0])
+            return
         self.println(pytmpl[file0])
-        for p in package_names:
-            self.doclass(p.upper())
+        if self.asyncclasses:
+            self.println(pytmpl[afile0])
+
+    def dofile(self,package_names,jobs=1,pool=None,cache=None):
+        """process a file"""
+        self.dofile0()
+        package_names=[p.upper() for p in package_names]
+        for pdat in self.getclasses(package_names,jobs,pool,cache):
+            self.emitclass(pdat)
         self.println(pytmpl[file1])
 
+    def dolazy(self,package_names,path,jobs=1,pool=None,cache=None):
+        """process a file as a package that loads its methods on demand
+
+        path/__init__.py has the classes without their methods, each
+        class's methods are in path/_name.py and their doc strings in
+        path/_name_doc.py.  The modules are compiled to bytecode.
+        Returns a list of (module path, whether it changed).
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        pkgname=os.path.basename(os.path.normpath(path))
+        facade=Outfile(os.path.join(path,'__init__.py'))
+        self.output=facade
+        self.dofile0()
+        self.println(pytmpl[lfile0])
+        outputs=[facade]
+        package_names=[p.upper() for p in package_names]
+        for pdat in self.getclasses(package_names,jobs,pool,cache):
+            modname='_'+(pdat.synonym or pdat.name).lower()
+            methods=Outfile(os.path.join(path,modname+'.py'))
+            methods.write(pytmpl[lmod0])
+            docs={}
+            self.output=Docsplit(methods,docs)
+            self.emitclass(pdat,(facade,pkgname,modname))
+            doc=Outfile(os.path.join(path,modname+'_doc.py'))
+            doc.write('docs = {\n')
+            for name in sorted(docs.keys()):
+                doc.write('    %r: %r,\n'%(name,docs[name]))
+            doc.write('}\n')
+            outputs.extend([methods,doc])
+        facade.write(pytmpl[file1])
+        written=[]
+        for output in outputs:
+            changed=output.close()
+            if changed or not os.path.exists(output.path+'c'):
+                py_compile.compile(output.path,doraise=True)
+            written.append((output.path,changed))
+        return written
+
+    def doschema(self,owner,outdir):
+        """process every package of a schema, one module per package
+
+        Returns a list of (module path, whether it changed).
+        """
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        written=[]
+        for pdat in self.sweep(owner):
+            modname=(pdat.synonym or pdat.name).lower()
+            self.output=Outfile(os.path.join(outdir,modname+'.py'))
+            self.dofile0()
+            self.emitclass(pdat)
+            self.println(pytmpl[file1])
+            written.append((self.output.path,self.output.close()))
+            del self.pkgs[(owner,pdat.name)]
+        return written
+
     def doproc1(self,owner,procname,package_name):
         """process one procedure, normal version"""
         lprocname=procname.lower()
         parms=self.getparms(owner,procname, package_name)
-        arraytype=self.getarrayparms(owner,procname,package_name)
         if self.memberdocs.has_key(lprocname):
             comment=self.memberdocs[lprocname]
         else:
@@ -380,64 +2792,110 @@ class PyTrans(Trans):
         else:
             plist1=','+','.join(parms)
             plist2=',['+','.join(parms)+']'
-        alist=""
-        if len(arraytype) > 0:
-            for parm in arraytype.keys():
-                alist+="        %s=self.curs.arrayvar(cx_Oracle.%s, %s)\n" % \
-                        (parm,self.typemap[arraytype[parm]],parm)
+        alist=self.dochunks(owner,procname,package_name)
+        alist+=self.doarrays(owner,procname,package_name)
+        alist+=self.dolobins(owner,procname,package_name)
+        lobouts=''
+        for i,t,mode in self.getlobparms(owner,procname,package_name):
+            if mode!='IN':
+                lobouts+="        result[%d]=self._lob(result[%d])\n"%(i,i)
+        binds,bindlist=self.dobinds(owner,procname,package_name,parms)
+        if binds:
+            plist2=','+bindlist
         decl=\
-          pytmpl[proc0]%(lprocname,plist1,comment,alist,package_name,procname,plist2)
+          pytmpl[proc0]%(lprocname,plist1,comment,alist,binds or '',
+                         self.action(procname),self.stmtname(procname),
+                         plist2,lobouts)
         self.println(decl)
+        self.methods.append((acall0,lprocname,plist1,comment,plist1))
 
     def doprocv(self,owner,procname,package_name):
         """process one procedure, vectorized version"""
-        #TODO: should we not generate this if there's an out parm?
-        #TODO: or have it generate a warning?
         lprocname=procname.lower()
-        parms=self.getparms(owner,procname, package_name)
         arrayindices=self.getarrayindices(owner,procname,package_name)
-        raise_exception = ""
-        if self.hasoutputparms(owner,procname,package_name):
-            raise_exception ="        # We don't support out or in/out parameters\n"
-            raise_exception+="        raise NotImplementedError('Out array parameters not supported')\n"
         if self.memberdocs.has_key(lprocname):
             comment=self.memberdocs[lprocname]
         else:
             comment= "        (No doc string for this procedure)\n"
             comment+="        (orapig --helpfmt for more info )"
         comment+='\n        (this is the autogenerated vectorized _V procedure)'
-        comment+='\n        (dont use it if you have out parms)'
-        nparms=len(parms)
-        plist2=""
-        for i in range(0,nparms):
-            plist2+=', :%d'%(i+1)
-        plist2=plist2[2:]
-        param_loop = ""
-        for i in range(1,len(parms)+1):
-            if i in arrayindices.keys():
-                param_loop+="            dict['%d']=self.curs.arrayvar(cx_Oracle.%s, parmlist[i][%d])\n" % \
-                             (i,self.typemap[arrayindices[i]],i-1)
-            else:
-                param_loop+="            dict['%d']=parmlist[i][%d]\n" % (i, i-1)
-        decl=pytmpl[procv0]%(lprocname+"_V",comment,raise_exception,param_loop,package_name,procname,plist2)
+        comment+='\n        (parmlist may be any iterable, sent batchsize rows at a time)'
+        comment+='\n        (batcherrors returns failed rows as (index, error) pairs)'
+        sizes=self.getsizes(owner,procname,package_name)
+        modes=self.getparmmodes(owner,procname,package_name)
+        outs=[i for i in range(len(modes)) if sizes[i] and modes[i]!='IN']
+        # a PL/SQL table cannot be an element of an array bind, and OUT
+        # values of types with no bind size (RAW, ROWID, LOBs...) would
+        # be bound as inputs and lost, so these go a row at a time
+        eachrow=[i for i in range(len(modes)) if not sizes[i] and modes[i]!='IN']
+        if outs or eachrow:
+            comment+='\n        (returns the parameter list of each row, with OUT values)'
+        if eachrow:
+            comment+='\n        (OUT parameters that cannot be array bound: one round trip per row)'
+            call="self._calleach(self.%s,parmlist,batcherrors)"%lprocname
+        else:
+            arrays=', '.join(['%d:cx_Oracle.%s'%(i-1,self.typemap[arrayindices[i]])
+                              for i in sorted(arrayindices.keys())])
+            tsizes='None'
+            if [s for s in sizes if s]:
+                tsizes=self.stmtname(procname)+'_T'
+            call ="self._executemany(%s,%s,parmlist,\n"%(self.stmtname(procname),tsizes)
+            call+="                                   batchsize,batcherrors,{%s},%s)"%\
+                  (arrays,tuple(outs))
+        decl=pytmpl[procv0]%(lprocname+"_V",comment,self.action(procname),
+                             call)
         self.println(decl)
+        self.methods.append((amany0,lprocname+"_V",'',comment,
+                             (outs or eachrow) and 'True' or 'False'))
 
     def doprocs(self,owner,package_name):
         """process all procs"""
         procs=self.getprocedures(owner,package_name)
         for p in procs:
+            t=time.time()
             if self.isfunc(owner,p,package_name):
                 self.dofunc1(owner,p,package_name)
             else:
                 self.doproc1(owner,p,package_name)
                 self.doprocv(owner,p,package_name)
+            self.docursors(owner,p,package_name)
+            if self.stats:
+                self.stats.proc('%s.%s'%(package_name,p),time.time()-t)
+
+    def iscached(self,owner,funcname,package_name):
+        """can this function's results be cached?  It must be marked
+        DETERMINISTIC, RESULT_CACHE or @cache, and take only scalar IN
+        parameters and return a scalar."""
+        if funcname not in self.getpackage(owner,package_name).cached:
+            return False
+        if not self.isfunc(owner,funcname,package_name):
+            return False
+        if self.getarrayparms(owner,funcname,package_name):
+            return False
+        if [m for m in self.getparmmodes(owner,funcname,package_name)
+            if m!='IN']:
+            return False
+        return self.getsizes(owner,funcname,package_name)[0] is not None
+
+    def docaches(self,pdat):
+        """the entries of a class's caches dictionary; RESULT_CACHE
+        results may go stale as the tables under them change, so they
+        are only kept resultttl seconds"""
+        caches=[]
+        for p in pdat.procs:
+            if not self.iscached(pdat.owner,p,pdat.name):
+                continue
+            ttl=''
+            if p in pdat.resultcached:
+                ttl='ttl=%d'%self.resultttl
+            caches.append("'%s':ResultCache(%s)"%(p.lower(),ttl))
+        return ','.join(caches)
 
     def dofunc1(self,owner,funcname, package_name):
         """process one func"""
         lfuncname=funcname.lower()
-        oraretype,retype=self.getpyfunctype(owner,funcname)
+        oraretype,retype=self.getpyfunctype(owner,funcname,package_name)
         parms=self.getparms(owner,funcname,package_name)
-        arraytype=self.getarrayparms(owner,funcname,package_name)
         if self.memberdocs.has_key(lfuncname):
             comment=self.memberdocs[lfuncname]
         else:
@@ -445,44 +2903,274 @@ class PyTrans(Trans):
             comment+="        (orapig --helpfmt for more info)"
         if len(parms)==0:
             plist1=''
-            plist2=''
         else:
             plist1=','+','.join(parms)
-            plist2=',['+','.join(parms)+']'
-        alist=""
-        if len(arraytype) > 0:
-            for parm in parms:
-                alist+="        %s=self.curs.arrayvar(cx_Oracle.%s, %s)" % \
-                        (parm,self.typemap[arraytype[parm]],parm)
+        alist=self.doarrays(owner,funcname,package_name)
+        alist+=self.dolobins(owner,funcname,package_name)
+        alist=alist.rstrip('\n')
         if retype:
-            decl=pytmpl[func0]%(lfuncname,plist1,comment,alist,
-                            package_name,funcname,retype,plist2)
+            if self.getsizes(owner,funcname,package_name)[0]:
+                rv='_v[0]'
+                binds,bindlist=self.dobinds(owner,funcname,package_name,
+                                            [None]+parms)
+            else:
+                rv='rv'
+                binds,bindlist=self.dobinds(owner,funcname,package_name,
+                                            ['rv']+parms)
+                binds="        rv=self.curs.var(%s)\n"%retype+(binds or '')
+                bindlist=bindlist or '['+','.join(['rv']+parms)+']'
+            lookup=store=''
+            if self.iscached(owner,funcname,package_name):
+                key='(%s)'%','.join(['self._db']+parms+['']*(not parms))
+                lookup ="        _c=self.caches['%s']\n"%lfuncname
+                lookup+="        rv=_c.get(%s,_c)\n"%key
+                lookup+="        if rv is not _c:\n"
+                lookup+="            return rv\n"
+                store="        _c.put(%s,rv)\n"%key
+            if oraretype in self.lobtypes:
+                store="        rv=self._lob(rv)\n"+store
+            decl=pytmpl[func0]%(lfuncname,plist1,comment,alist,lookup,binds,
+                            self.action(funcname),self.stmtname(funcname),
+                            bindlist,rv,store)
         else:
             decl=pytmpl[func1]%(lfuncname,plist1,comment,alist,oraretype)
             
         self.println(decl)
+        self.methods.append((acall0,lfuncname,plist1,comment,plist1))
+
+    def docursors(self,owner,objname,package_name):
+        """process the _iter and _L forms of a function returning a
+        REF CURSOR, or of a procedure with one REF CURSOR OUT parm"""
+        lname=objname.lower()
+        parms=self.getparms(owner,objname,package_name)
+        if self.isfunc(owner,objname,package_name):
+            if self.getfunctype(owner,objname,package_name)!='REF CURSOR':
+                return
+            values=['rv']+parms
+            args=parms
+        else:
+            types=self.getparmtypes(owner,objname,package_name)
+            modes=self.getparmmodes(owner,objname,package_name)
+            refs=[i for i in range(len(parms))
+                  if types[i]=='REF CURSOR' and modes[i]=='OUT']
+            if len(refs)!=1:
+                return
+            values=parms[:]
+            values[refs[0]]='rv'
+            args=parms[:refs[0]]+parms[refs[0]+1:]
+        if self.memberdocs.has_key(lname):
+            comment=self.memberdocs[lname]
+        else:
+            comment= "        (No doc string for this procedure)\n"
+            comment+="        (orapig --helpfmt for more info )"
+        plist1=''.join([','+a for a in args])
+        alist=self.doarrays(owner,objname,package_name)
+        alist+=self.dolobins(owner,objname,package_name)
+        binds,bindlist=self.dobinds(owner,objname,package_name,values)
+        binds="        rv=self._refcursor(arraysize)\n"+(binds or '')
+        bindlist=bindlist or '['+','.join(values)+']'
+        for suffix,doc,ret in (
+              ('_iter','_iter version, streams arraysize rows per fetch',
+               'self._rows(rv)'),
+              ('_L','list-consing _L version','self._fetchall(rv)'),
+              ('_columns','_columns version, returns {column: array}',
+               'self._columns(rv)')):
+            self.println(pytmpl[curs0]%(lname+suffix,plist1,comment,doc,alist,
+                                        binds,self.action(objname),
+                                        self.stmtname(objname),bindlist,ret))
+            if suffix=='_iter':
+                self.methods.append((astream0,lname+suffix,plist1,comment,
+                                     ','.join(args)))
+            else:
+                self.methods.append((acall0,lname+suffix,
+                                     plist1+',arraysize=None',comment,
+                                     plist1+',arraysize=arraysize'))
+
+    def stmtname(self,procname):
+        """the module constant holding a subprogram's call statement"""
+        return '_%s__%s'%(self.classname.upper(),procname)
+
+    def action(self,procname):
+        """the session action naming a subprogram's calls"""
+        return '%s.%s'%(self.classname.upper(),procname.upper())
+
+    def callstmt(self,owner,procname,package_name):
+        """the statement calling a subprogram, or None for a function
+        returning an unsupported type"""
+        nparms=len(self.getparms(owner,procname,package_name))
+        if self.isfunc(owner,procname,package_name):
+            if not self.getpyfunctype(owner,procname,package_name)[1]:
+                return None
+            binds=[':%d'%(i+2) for i in range(nparms)]
+            call=':1 := %s.%s(%s)'%(self.callname,procname,', '.join(binds))
+        else:
+            binds=[':%d'%(i+1) for i in range(nparms)]
+            call='%s.%s(%s)'%(self.callname,procname,', '.join(binds))
+        return '"begin %s; end;"'%call
+
+    def tuplestr(self,items):
+        """python source for a tuple of source expressions"""
+        return '('+', '.join(items)+(len(items)==1 and ',)' or ')')
+
+    def dostmts(self,owner,package_name):
+        """emit the call statements of a package as module constants
+
+        Every call of a generated method executes the same statement
+        text, so the driver parses it once and finds it in the
+        statement cache from then on.
+        """
+        for p in self.getprocedures(owner,package_name):
+            stmt=self.callstmt(owner,p,package_name)
+            if stmt is None:
+                continue
+            self.output.write(pytmpl[stmt0]%(self.stmtname(p),stmt))
+            sizes=self.getsizes(owner,p,package_name)
+            if [s for s in sizes if s]:
+                self.output.write(pytmpl[stmt0]%(self.stmtname(p)+'_T',
+                                  self.tuplestr(map(str,sizes))))
+        self.println('')
+
+    def dotable(self,pdat):
+        """emit a --runtime class: its methods as a table for
+        orapig_runtime.methods()"""
+        owner,package_name=pdat.owner,pdat.name
+        self.output.write(pytmpl[rclass0]%(self.classname,pdat.doc,
+                                           self.docaches(pdat),self.classname))
+        for p in self.getprocedures(owner,package_name):
+            lname=p.lower()
+            parms=self.getparms(owner,p,package_name)
+            modes=self.getparmmodes(owner,p,package_name)
+            types=self.getparmtypes(owner,p,package_name)
+            sizes=self.getsizes(owner,p,package_name)
+            stmt=self.callstmt(owner,p,package_name)
+            arrays=self.getarrayindices(owner,p,package_name)
+            widths=self.getarraywidths(owner,p,package_name)
+            tables=[]
+            for i in sorted(arrays.keys()):
+                t='cx_Oracle.'+self.typemap[arrays[i]]
+                if widths.has_key(parms[i-1]):
+                    t='(%s, %d)'%(t,widths[parms[i-1]])
+                tables.append('%d: %s'%(i-1,t))
+            arrays=', '.join(tables)
+            lobs=', '.join(['%d: %s'%(i,t) for i,t,mode
+                            in self.getlobparms(owner,p,package_name)])
+            rettype=cursor='None'
+            if self.isfunc(owner,p,package_name):
+                kind='func'
+                oratype,pytype=self.getpyfunctype(owner,p,package_name)
+                if not pytype:
+                    kind='unsupported'
+                    rettype=repr(oratype)
+                elif not sizes[0]:
+                    rettype=pytype
+                if oratype=='REF CURSOR':
+                    cursor='0'
+                nodoc="        (No doc string for this function)\n" \
+                      "        (orapig --helpfmt for more info)"
+            else:
+                kind='proc'
+                refs=[i for i in range(len(parms))
+                      if types[i]=='REF CURSOR' and modes[i]=='OUT']
+                if len(refs)==1:
+                    cursor=str(refs[0])
+                nodoc="        (No doc string for this procedure)\n" \
+                      "        (orapig --helpfmt for more info )"
+            if not [s for s in sizes if s]:
+                sizes='None'
+            else:
+                sizes=self.tuplestr(map(str,sizes))
+            self.println("    (%r, %r, %s, %s,\n     %s, %s, {%s}, {%s}, %s, %s, %s,\n     %r),"%
+                (lname,kind,stmt or 'None',sizes,
+                 self.tuplestr(map(repr,parms)),self.tuplestr(map(repr,modes)),
+                 arrays,lobs,rettype,cursor,self.iscached(owner,p,package_name),
+                 self.memberdocs.get(lname,nodoc)))
+        self.println('))')
+
+    def doruntime(self,path):
+        """write orapig_runtime.py, the module --runtime modules import;
+        returns (path, whether it changed)"""
+        output=Outfile(path)
+        output.write(pytmpl[file0]+'\n')
+        output.write(pytmpl[rt0])
+        return path,output.close()
+
+    def emitclass(self,pdat,lazy=None):
+        """emit one class from its package model
+
+        With lazy, a (facade output, package name, module name) triple,
+        the class itself goes to the facade output, and its statements
+        and methods to the current output, a Docsplit.
+        """
+        t=time.time()
+        self.pkgs[(pdat.owner,pdat.name)]=pdat
+        self.memberdocs=pdat.memberdocs
+        self.callname=pdat.callname or pdat.name
+        self.classname = (pdat.synonym or pdat.name).capitalize()
+        if self.runtime:
+            self.dotable(pdat)
+            if self.stats:
+                self.stats.package(pdat.name,time.time()-t)
+            return
+        self.dostmts(pdat.owner, pdat.name)
+        head=pytmpl[class0]%(self.classname,pdat.doc,self.docaches(pdat))
+        if lazy:
+            facade,pkgname,modname=lazy
+            facade.write(head+pytmpl[lazy0]%('%s.%s'%(pkgname,modname),
+                                             '%s.%s_doc'%(pkgname,modname)))
+            self.println(pytmpl[lclass0]%(self.classname,pkgname,
+                                          self.classname))
+        else:
+            self.println(head)
+        self.methods=[]
+        self.doprocs(pdat.owner, pdat.name)
+        if self.asyncclasses:
+            self.doasync(pdat)
+        if self.stats:
+            self.stats.package(pdat.name,time.time()-t)
+
+    def doasync(self,pdat):
+        """emit the asyncio class of a package, from the methods
+        recorded while emitting its class"""
+        self.println(pytmpl[aclass0]%(self.classname,pdat.name,self.classname,
+                                      self.classname,self.classname))
+        for tmpl,name,parms,comment,extra in self.methods:
+            self.println(pytmpl[tmpl]%(name,parms,comment,name,extra))
 
     def doclass(self,package_name):
         """process one class"""
-        curs = self.conn.cursor()
-        synonym = package_name
-        _, _, owner, realname, part2, dblink, part1_type, object_number = \
-             curs.callproc("DBMS_UTILITY.NAME_RESOLVE", (package_name, 1, " "*30, " "*30, " "*30, " "*30, 0, 0))
-        if synonym == realname and self.conn.username.upper() == owner:
-            synonym = None
-        classname = (synonym or package_name).capitalize()
-        assert part2 is None
-        doctext=self.getdoc(synonym, owner, realname)
-        if True: # if self.pkgexists(package_name):
-            self.println(pytmpl[class0]%(classname,doctext))
-            self.doprocs(owner, realname)
-        else:
-            self.err('ERROR: package not found: %s'%(package_name))
+        self.emitclass(self.getclass(package_name))
 
 #-----------------------------------------------------------------------
 # main
 #-----------------------------------------------------------------------
 
+def connect(opts):
+    """connect to the database, returning the connection and session pool"""
+    oraconnre = re.compile("^([^/@]*)(/([^@]*))?(@(.*))?$")
+    user,password,host=oraconnre.match(opts.conn).groups()[0::2]
+    if opts.password:
+        password=opts.password
+    if not password:
+        password=getpass.getpass()
+    connstr="%s/%s"%(user,password)
+    if host:
+        connstr+="@%s" % host
+    pool=None
+    if opts.sys:
+        if opts.jobs>1:
+            print >>sys.stderr,'--jobs is not supported with --sys'
+            sys.exit(1)
+        conn=cx_Oracle.connect(connstr,mode=cx_Oracle.SYSDBA)
+    elif opts.jobs>1:
+        # one session for each worker, plus this one
+        pool=cx_Oracle.SessionPool(user,password,host or '',
+                                   opts.jobs+1,opts.jobs+1,1,threaded=True)
+        conn=pool.acquire()
+    else:
+        conn=cx_Oracle.connect(connstr)
+
+    return conn,pool
+
 def main():
     """main program"""
 
@@ -499,30 +3187,112 @@ def main():
                  help="dump datastructures for debugging")
     p.add_option("","--sys",action="store_true",dest="sys",default=False,
                  help="connect as sysdba")
+    p.add_option("-j","--jobs",action="store",type="int",dest="jobs",default=1,
+                 help="introspect this many packages at once")
+    p.add_option("","--cache",action="store",type="string",dest="cache",
+                 help="package model cache file, reused while unchanged")
+    p.add_option("","--snapshot-out",action="store",type="string",
+                 dest="snapshot_out",
+                 help="write the package models to this file and exit")
+    p.add_option("","--snapshot-in",action="store",type="string",
+                 dest="snapshot_in",
+                 help="generate from this snapshot file, without a database")
+    p.add_option("","--schema",action="store",type="string",dest="schema",
+                 help="generate every package of this schema")
+    p.add_option("","--outdir",action="store",type="string",dest="outdir",
+                 default=".",help="directory for --schema modules")
+    p.add_option("","--stats",action="store_const",const="text",dest="stats",
+                 help="report queries, rows and timings on stderr")
+    p.add_option("","--stats-json",action="store_const",const="json",
+                 dest="stats",help="like --stats, as json")
+    p.add_option("","--async",action="store_true",dest="asyncclasses",
+                 default=False,
+                 help="also generate asyncio classes (python 3.6 and up)")
+    p.add_option("","--runtime",action="store_true",dest="runtime",
+                 default=False,
+                 help="write compact modules calling through orapig_runtime.py")
+    p.add_option("","--lazy",action="store_true",dest="lazy",default=False,
+                 help="write a package loading its methods on demand to --output")
     p.add_option("","--helpfmt",action="store_true",dest="helpfmt",
                  default=False, help="show help for formatting")
     (opts,args) = p.parse_args()
 
-    if not (opts.conn and args):
-        p.print_help()
+    if opts.lazy and not opts.output:
+        print >>sys.stderr,'--lazy needs --output, the package directory'
+        sys.exit(1)
+    if opts.lazy and (opts.schema or opts.asyncclasses):
+        print >>sys.stderr,'--lazy is not supported with --schema or --async'
+        sys.exit(1)
+    if opts.runtime and not (opts.output or opts.schema):
+        print >>sys.stderr,'--runtime needs --output or --schema'
+        sys.exit(1)
+    if opts.runtime and (opts.lazy or opts.asyncclasses):
+        print >>sys.stderr,'--runtime is not supported with --lazy or --async'
+        sys.exit(1)
+    if opts.snapshot_in and opts.schema:
+        print >>sys.stderr,'--snapshot-in is not supported with --schema'
         sys.exit(1)
 
-    oraconnre = re.compile("^([^/@]*)(/([^@]*))?(@(.*))?$")
-    user,password,host=oraconnre.match(opts.conn).groups()[0::2]
-    if opts.password:
-        password=opts.password
-    if not password:
-        password=getpass.getpass()
-    connstr="%s/%s"%(user,password)
-    if host:
-        connstr+="@%s" % host
-    if opts.sys:
-        conn=cx_Oracle.connect(connstr,mode=cx_Oracle.SYSDBA)
+    stats=None
+    if opts.stats:
+        stats=Stats()
+
+    if opts.snapshot_in:
+        snapshot=loadsnapshot(opts.snapshot_in)
+        if not args:
+            args=[name for name,pdat in snapshot]
+        snapshot=dict(snapshot)
+        for a in args:
+            if not snapshot.has_key(a.upper()):
+                print >>sys.stderr,'package not in snapshot:',a
+                sys.exit(1)
+        conn=None
+        pool=None
     else:
-        conn=cx_Oracle.connect(connstr)
+        if not (opts.conn and (args or opts.schema)):
+            p.print_help()
+            sys.exit(1)
+        conn,pool=connect(opts)
+
+    if opts.schema:
+        trans=PyTrans(conn,None,stats,opts.asyncclasses,opts.runtime)
+        written=trans.doschema(opts.schema.upper(),opts.outdir)
+        if opts.runtime:
+            written.append(trans.doruntime(
+                os.path.join(opts.outdir,'orapig_runtime.py')))
+        summarize(written)
+        if stats:
+            stats.report(sys.stderr,opts.stats)
+        sys.exit(0)
+
+    cache=None
+    if opts.cache and not opts.snapshot_in:
+        cache=Pcache(opts.cache)
+
+    if opts.snapshot_out:
+        trans=Trans(conn,None,stats)
+        names=[a.upper() for a in args]
+        pdats=list(trans.getclasses(names,opts.jobs,pool,cache))
+        savesnapshot(opts.snapshot_out,zip(names,pdats))
+        if cache:
+            cache.save()
+        if stats:
+            stats.report(sys.stderr,opts.stats)
+        sys.exit(0)
+
+    if opts.lazy:
+        trans=PyTrans(conn,None,stats)
+        if opts.snapshot_in:
+            trans.snapshot=snapshot
+        summarize(trans.dolazy(args,opts.output,opts.jobs,pool,cache))
+        if cache:
+            cache.save()
+        if stats:
+            stats.report(sys.stderr,opts.stats)
+        sys.exit(0)
 
     if opts.output:
-        output=open(opts.output,"w")
+        output=Outfile(opts.output)
     else:
         output=sys.stdout
 
@@ -532,7 +3302,9 @@ def main():
         sys.exit(0)
 
     if opts.lang is None or opts.lang=="python" or opts.lang=='py':
-        trans=PyTrans(conn,output)
+        trans=PyTrans(conn,output,stats,opts.asyncclasses,opts.runtime)
+        if opts.snapshot_in:
+            trans.snapshot=snapshot
     elif opts.lang=='cxx':
         trans=None
     elif opt.lang=='rb':
@@ -541,7 +3313,18 @@ def main():
         print >>sys.stderr,'unsupported language:',opt.lang
         sys.exit(1)
 
-    trans.dofile(args)
+    trans.dofile(args,opts.jobs,pool,cache)
+    if opts.output:
+        written=[(opts.output,output.close())]
+        if opts.runtime:
+            written.append(trans.doruntime(os.path.join(
+                os.path.dirname(opts.output),'orapig_runtime.py')))
+        summarize(written)
+    if cache:
+        cache.save()
+    if stats:
+        stats.report(sys.stderr,opts.stats)
     sys.exit(0)
 
-main()
+if __name__=='__main__':
+    main()
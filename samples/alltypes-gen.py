@@ -21,6 +21,18 @@ as
 """
 
 HPKGFOOT="""
+    type varchar2tbl is table of varchar2(100) index by binary_integer;
+
+    --------------------------------------------------------------------
+    --+ p_growtbl -- test an inout table of varchar2 whose elements
+    --+   come back longer than they went in
+    --+ parameters:
+    --+   x_varchar2tbl_inout : inout parameter of type varchar2tbl
+    --------------------------------------------------------------------
+    procedure p_growtbl(
+        x_varchar2tbl_inout in out varchar2tbl
+    );
+
     --------------------------------------------------------------------
     --+ p_noparms -- test a proc with no parameters
     --+ parameters:
@@ -80,6 +92,18 @@ as
 """
 
 BPKGFOOT="""
+    --------------------------------------------------------------------
+    procedure p_growtbl(
+        x_varchar2tbl_inout in out varchar2tbl
+    )
+    is
+    begin
+        for i in 1..x_varchar2tbl_inout.count loop
+            x_varchar2tbl_inout(i) := x_varchar2tbl_inout(i) ||
+                                      x_varchar2tbl_inout(i);
+        end loop;
+    end p_growtbl;
+
     --------------------------------------------------------------------
     procedure p_noparms
     is
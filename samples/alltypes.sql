@@ -134,6 +134,18 @@ as
         x_timestamp_out out timestamp,
         x_timestamp_inout in out timestamp
     ) return timestamp;
+    type varchar2tbl is table of varchar2(100) index by binary_integer;
+
+    --------------------------------------------------------------------
+    --+ p_growtbl -- test an inout table of varchar2 whose elements
+    --+   come back longer than they went in
+    --+ parameters:
+    --+   x_varchar2tbl_inout : inout parameter of type varchar2tbl
+    --------------------------------------------------------------------
+    procedure p_growtbl(
+        x_varchar2tbl_inout in out varchar2tbl
+    );
+
     --------------------------------------------------------------------
     --+ p_noparms -- test a proc with no parameters
     --+ parameters:
@@ -347,6 +359,18 @@ as
             to_char(x_timestamp_inout));
         return x_timestamp_in;
     end f_timestamp;
+    --------------------------------------------------------------------
+    procedure p_growtbl(
+        x_varchar2tbl_inout in out varchar2tbl
+    )
+    is
+    begin
+        for i in 1..x_varchar2tbl_inout.count loop
+            x_varchar2tbl_inout(i) := x_varchar2tbl_inout(i) ||
+                                      x_varchar2tbl_inout(i);
+        end loop;
+    end p_growtbl;
+
     --------------------------------------------------------------------
     procedure p_noparms
     is
@@ -25,6 +25,7 @@ as
     --------------------------------------------------------------------
     --+ this is a function
     --+ x : some number
+    --+ @cache
     --------------------------------------------------------------------
     function f1(x in number)
         return number;
@@ -88,6 +88,14 @@ class AllTypesTest(ExportedModuleBase, unittest.TestCase):
         result=self.package.f_timestamp(date1,date2,date3)
         self.assertEqualTime(date1,result)
 
+    def testbatch(self):
+        with self.package.batch() as b:
+            f=b.f_number(1, 2, 3)
+            p=b.p3_number(4, 5, 6)
+            self.assert_(not f.done())
+        self.assertEquals(1.0, f.result())
+        self.assertEquals([4,]*3, p.result())
+
     #Package Procedure Tests
     def testp3_float(self):
         result=self.package.p3_float(1.1, 2.2, 3.3)
@@ -122,6 +130,9 @@ class AllTypesTest(ExportedModuleBase, unittest.TestCase):
     def testp3_number(self):
         result=self.package.p3_number(1, 2, 3)
         self.assertEquals([1]*3, result)
+        self.assert_(not [r for r in result if isinstance(r,float)])
+        result=self.package.p3_number(2**53+1, 2, 3)
+        self.assertEquals([2**53+1]*3, result)
 
     def testp3_timestamp(self):
         date1=datetime.datetime(2001, 1, 1, 1, 11, 11)
@@ -135,40 +146,59 @@ class AllTypesTest(ExportedModuleBase, unittest.TestCase):
     #Vectorized procedures with arrays
     def testp3_varchar2_V(self):
         result=self.package.p3_varchar2_V([["aaa","bbb","ccc"], ["ccc","ddd","fff"]])
-        self.assert_(result is None)
+        self.assertEquals([['aaa']*3,['ccc']*3], result)
 
     def testp3_float_V(self):
-        result=self.package.p3_varchar2_V([ [1.1, 2.2, 3.3], [4.4, 5.5, 6.6] ])
-        self.assert_(result is None)
+        result=self.package.p3_float_V([ [1.1, 2.2, 3.3], [4.4, 5.5, 6.6] ])
+        self.assertEquals([[1.1000000000000001]*3,[4.4000000000000004]*3], result)
 
     def testp3_number_V(self):
         result=self.package.p3_number_V([ [1,1,1] , [2,2,2] , [3,3,3] ])
-        self.assert_(result is None)
+        self.assertEquals([[1]*3,[2]*3,[3]*3], result)
 
     def testp3_date_V(self):
         date1=datetime.datetime(2001, 1, 1, 1, 11, 11)
         date2=datetime.datetime(2002, 2, 2, 2, 22, 22)
         date3=datetime.datetime(2003, 3, 3, 3, 33, 33)
         result=self.package.p3_date_V([[date1,date2,date3],[date3,date2,date1]])
-        self.assert_(result is None)
+        self.assertEqualTime(date1,result[0][1])
+        self.assertEqualTime(date3,result[1][2])
 
     def testp3_timestamp_V(self):
         date1=datetime.datetime(2001, 1, 1, 1, 11, 11)
         date2=datetime.datetime(2002, 2, 2, 2, 22, 22)
         date3=datetime.datetime(2003, 3, 3, 3, 33, 33)
         result=self.package.p3_timestamp_V([[date1,date2,date3],[date3,date2,date1]])
-        self.assert_(result is None)
+        self.assertEqualTime(date1,result[0][1])
+        self.assertEqualTime(date3,result[1][2])
 
     def testp_noparms_V(self):
         result=self.package.p_noparms_V([[],[],[]])
         self.assert_(result is None)
 
+    #Procedures with tables
+    def testp_growtbl(self):
+        result=self.package.p_growtbl(['a', 'bc'])
+        self.assertEquals([['aa', 'bcbc']], result)
+        # longer than any element passed in
+        result=self.package.p_growtbl(['x'*40])
+        self.assertEquals([['x'*80]], result)
+
+    def testp_growtbl_V(self):
+        result=self.package.p_growtbl_V([[['a']], [['b'*50]]])
+        self.assertEquals([[['aa']], [['b'*100]]], result)
+
 
 class TinySampleTest(ExportedModuleBase, unittest.TestCase):
     """Tests against the 'tinysample' package"""
 
     module_name='tinysample'
 
+    def testbatch(self):
+        with self.package.batch() as b:
+            results=[b.f1(18), b.p1(14), b.p0()]
+        self.assertEquals([18,[14],[]], [r.result() for r in results])
+
     def testf0(self):
         result=self.package.f0()
         self.assertEquals(17,result)
@@ -177,6 +207,40 @@ class TinySampleTest(ExportedModuleBase, unittest.TestCase):
         result=self.package.f1(18)
         self.assertEquals(18,result)
 
+    def testf1_cached(self):
+        cache=self.package.caches['f1']
+        cache.clear()
+        hits=cache.hits
+        self.assertEquals([18,18],[self.package.f1(5),self.package.f1(5)])
+        self.assertEquals(hits+1,cache.hits)
+        cache.invalidate(5)
+        self.assertEquals(0,len(cache))
+
+    def testmetrics(self):
+        import tinysample
+        metrics=tinysample.Metrics()
+        metrics.watch(tinysample.Tinysample)
+        try:
+            self.package.f1(18)
+            self.package.p1_V([[1],[2]])
+        finally:
+            metrics.unwatch(tinysample.Tinysample)
+        stats=metrics.snapshot()
+        self.assertEquals(1,stats['Tinysample.f1']['calls'])
+        self.assertEquals(2,stats['Tinysample.p1_V']['rows'])
+        self.assert_('orapig_call_seconds_count' in metrics.prometheus())
+
+    def testtags(self):
+        self.package.tagging=True
+        self.package.clientid='orapig-test'
+        self.package.p0()
+        self.cur.execute("select sys_context('userenv','module'),"
+                         " sys_context('userenv','action'),"
+                         " sys_context('userenv','client_identifier')"
+                         " from dual")
+        self.assertEquals(('TINYSAMPLE','TINYSAMPLE.P0','orapig-test'),
+                          self.cur.fetchone())
+
     def testp0(self):
         result=self.package.p0()
         self.assertEquals([],result)
@@ -221,6 +285,15 @@ class KeywordTest(ExportedModuleBase, unittest.TestCase):
         words.sort()
         self.assertEquals(words,result)
 
+    def testbatch(self):
+        with self.package.batch() as b:
+            b.add(22,'blue')
+            b.add(22,'red')
+            result=b.delet(22,'blue')
+        self.assertEquals([22,'blue'],result.result())
+        self.assertEquals([],self.package.get_ids_L('blue'))
+        self.assertEquals([22],[w[0] for w in self.package.get_ids_L('red')])
+
     def testdelet(self):
         self.package.add(22,'blue')
         result=self.package.delet(22,'blue')
@@ -261,10 +334,90 @@ class KeywordTest(ExportedModuleBase, unittest.TestCase):
         result.sort()
         self.assertEquals(eresult,result)
 
+    def testall_words_iter(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.all_words_iter(arraysize=2)]
+        self.assertEquals([w[0] for w in self.package.all_words()],result)
+
+    def testall_words_L(self):
+        self.package.add_V(self.words)
+        result=self.package.all_words_L()
+        self.assert_(isinstance(result,list))
+        self.assertEquals([w for w in self.package.all_words()],result)
+
+    def testget_ids_iter(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_ids_iter('blue')]
+        self.assertEquals([w[0] for w in self.words if w[1]=='blue'],result)
+
+    def testget_ids_L(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_ids_L('blue')]
+        self.assertEquals([w[0] for w in self.words if w[1]=='blue'],result)
+
+    def testget_keywords_iter(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_keywords_iter(21)]
+        result.sort()
+        eresult=[w[1] for w in self.words if w[0]==21]
+        eresult.sort()
+        self.assertEquals(eresult,result)
+
+    def testget_keywords_L(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_keywords_L(21)]
+        result.sort()
+        eresult=[w[1] for w in self.words if w[0]==21]
+        eresult.sort()
+        self.assertEquals(eresult,result)
+
+    def testget_keywords2_iter(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_keywords2_iter(21,arraysize=1)]
+        self.assertEquals([w[0] for w in self.package.get_keywords2(21)],result)
+
+    def testget_keywords2_L(self):
+        self.package.add_V(self.words)
+        result=[w[0] for w in self.package.get_keywords2_L(21)]
+        self.assertEquals([w[0] for w in self.package.get_keywords2(21)],result)
+
+    def testall_words_columns(self):
+        self.package.add_V(self.words)
+        result=self.package.all_words_columns()
+        self.assertEquals([w[0] for w in self.package.all_words()],
+                          list(result['keyword']))
+
+    def testget_ids_columns(self):
+        self.package.add_V(self.words)
+        result=self.package.get_ids_columns('blue')
+        self.assertEquals([w[0] for w in self.words if w[1]=='blue'],
+                          list(result['id']))
+
+    def testget_keywords_columns(self):
+        self.package.add_V(self.words)
+        result=list(self.package.get_keywords_columns(21)['keyword'])
+        result.sort()
+        eresult=[w[1] for w in self.words if w[0]==21]
+        eresult.sort()
+        self.assertEquals(eresult,result)
+
+    def testget_keywords2_columns(self):
+        self.package.add_V(self.words)
+        result=self.package.get_keywords2_columns(21)
+        self.assertEquals([w[0] for w in self.package.get_keywords2(21)],
+                          list(result['keyword']))
+
     def testadd_V(self):
         result=self.package.add_V(self.words)
         self.assert_(result is None)
 
+    def testadd_V_batcherrors(self):
+        rows=self.words+[[21,'x'*40],[25,'green']]
+        result=self.package.add_V(iter(rows),batchsize=2,batcherrors=True)
+        self.assertEquals([5],[i for i,e in result])
+        self.cur.execute('select count(*) from keywords where id=25')
+        self.assertEquals(1,self.cur.fetchone()[0])
+
     def testdelet_V(self):
         self.package.add(22,'blue')
         result=self.package.delet(22,'blue')